@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""Benchmarks for the startup, load, near duplicate, reconcile, cold and warm bucket, render, session, server and save paths of the trainer.
+
+Every run generates synthetic decks in a temporary directory, times each
+benchmark (best of --repeat runs), measures its peak memory in a separate
+traced run and compares the times against the stored baseline:
+
+    python3 src_and_data/benchmark.py                            # compare against the baseline
+    python3 src_and_data/benchmark.py --sizes 1000 1000000       # other deck sizes
+    python3 src_and_data/benchmark.py --save-baseline            # store these results as the baseline
+
+The exit code is 1 if a benchmark got slower than the baseline by more than
+--tolerance. Baselines are machine specific, store one on the machine that
+runs the comparison.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import py_compile
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, List
+
+import progress_server
+import session_driver
+import vocabulary_trainer as vt
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(SCRIPT_DIR, "benchmark_baseline.json")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+SESSION_CARDS = 200   # cards answered by the scripted session
+RENDER_CARDS = 500    # cards rendered by the print_formated benchmark
+SERVER_CLIENTS = 50   # concurrent connections to the progress server
+SERVER_LEARNERS = 10  # users the connections are spread over
+SERVER_ROUNDS = 20    # cards every connection fetches and answers
+
+SYLLABLES = ("da", "ta", "base", "rel", "at", "ion", "key", "que", "ry", "sch", "ema", "nor", "mal", "form", "join", "in", "dex", "tu", "ple")
+DIAGRAM = (
+    "+-----------+        +-----------+\n"
+    "| Student   | 1    n | Enrolment |\n"
+    "+-----------+--------+-----------+\n"
+    "| id (PK)   |        | id (FK)   |\n"
+    "+-----------+        +-----------+"
+)
+
+def generate_deck(path: str, progress_path: str, size: int, seed: int = 1):
+    """Write a deck of `size` entries and a matching progress.txt.
+
+    Every 5th answer is a multi-line ASCII diagram, every 50th question a
+    duplicate that only differs in spacing and punctuation, and about half of
+    the entries have a progress record.
+    """
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))) for _ in range(words))
+
+    states = ("-", "s", "ks", "si", "ks 2.5 6.0 2 1700000000")
+    with open(path, "w", encoding="utf-8") as deck, open(progress_path, "w", encoding="utf-8") as progress:
+        question = ""
+        for i in range(size):
+            if i % 50 == 49:
+                question = question.replace(" ", "  ", 1) + "!"
+            else:
+                question = f"Q: {sentence(rng.randint(6, 14))}? [{i % 12 + 1}.{i % 5 + 1} Chapter {i % 12 + 1}]"
+            answer = f"A: {sentence(rng.randint(10, 30))}"
+            if i % 5 == 0:
+                answer += "\n" + DIAGRAM
+            deck.write(f"{question}\n{answer}\n")
+            if i % 2:
+                progress.write(f"{vt.entry_id(question)} {rng.choice(states)}\n")
+
+@dataclass
+class Case:
+    """One deck size, with the state the benchmarks share."""
+    size: int
+    path: str
+    entries: list = None
+    deck: vt.Deck = None
+    server: progress_server.ProgressServer = None
+
+@dataclass
+class Benchmark:
+    name: str
+    run: Callable[[Case], int]       # returns the number of items it processed
+    setup: Callable[[Case], None] = None
+
+def bench_load(case: Case) -> int:
+    case.entries = vt.load_vocab_file(case.path)
+    return len(case.entries)
+
+def bench_validate(case: Case) -> int:
+    vt.validate_format(case.entries)
+    return len(case.entries)
+
+def bench_near_duplicates(case: Case) -> int:
+    vt.find_near_duplicates(case.entries)
+    return len(case.entries)
+
+def setup_cold_start(case: Case):
+    if os.path.exists(vt.Entry.path_snapshot):
+        os.remove(vt.Entry.path_snapshot)
+
+def bench_load_deck(case: Case) -> int:
+    # Parsing, normalized dedup and reconciliation with progress.txt, or the snapshot of the last run
+    case.deck = vt.load_deck(case.path)
+    return case.size
+
+def run_trainer_process(args: List[str], keys: str = "") -> int:
+    """Start the trainer in a new interpreter, the way start_vocabtrainer.command does."""
+    env = dict(os.environ, PYTHONPATH=SCRIPT_DIR)
+    subprocess.run([sys.executable, "-m", "vocabulary_trainer", *args], input=keys, text=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, check=True)
+    return 1
+
+def setup_bytecode(case: Case):
+    # Python reuses the bytecode in __pycache__ when it is current, like on every start after the first
+    py_compile.compile(vt.__file__)
+
+def bench_first_card(case: Case) -> int:
+    # Start the trainer, reveal the first card, quit and leave
+    return run_trainer_process([], "\nq\n\n")
+
+def bench_cli_stats(case: Case) -> int:
+    return run_trainer_process(["stats"])
+
+def setup_cold_buckets(case: Case):
+    # The bucket sets are built on the first selection after a load or compaction
+    case.deck.members = None
+
+def bench_buckets(case: Case) -> int:
+    for label in vt.BUCKETS:
+        case.deck.bucket(label)
+    return len(case.deck) * len(vt.BUCKETS)
+
+def bench_render(case: Case) -> int:
+    entries = case.entries[:RENDER_CARDS]
+    for entry in entries:
+        vt.print_formated(entry.question, colour="WHITE", style="BOLD")
+        vt.print_formated(entry.answer, colour="WHITE", style="BOLD")
+    return len(entries)
+
+def setup_session(case: Case):
+    vt.render_cache = vt.RenderCache()
+
+def bench_session(case: Case) -> int:
+    # Answer known cards with '#', so they stay in the bucket for the next run
+    cards = min(SESSION_CARDS, len(case.deck.bucket("Known")))
+    session_driver.run_session(case.deck, ["", "#"] * cards + ["", "q"], "Known", record=False)
+    return cards
+
+def setup_server(case: Case):
+    # Every run starts with learners without progress
+    if case.server:
+        case.server.close()
+    shutil.rmtree(vt.Entry.path_users, ignore_errors=True)
+    case.server = progress_server.ProgressServer(case.deck)
+
+def bench_server(case: Case) -> int:
+    return asyncio.run(drive_server(case.server))
+
+async def drive_server(server: progress_server.ProgressServer) -> int:
+    """Let SERVER_CLIENTS connections fetch and answer cards at the same time, over localhost TCP."""
+    listener = await asyncio.start_server(server.serve_client, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+
+    async def client(n: int):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        user = f"/users/learner{n % SERVER_LEARNERS}"
+        for i in range(SERVER_ROUNDS):
+            _, reply = await progress_server.request(reader, writer, "GET", f"{user}/next")
+            await progress_server.request(reader, writer, "POST", f"{user}/cards/{reply['card']['id']}", {"known": i % 2 == 0})
+        writer.close()
+        await writer.wait_closed()
+
+    async with listener:
+        await asyncio.gather(*(client(n) for n in range(SERVER_CLIENTS)))
+    return SERVER_CLIENTS * SERVER_ROUNDS * 2
+
+def bench_save(case: Case) -> int:
+    vt.save_vocab(case.deck)
+    return len(case.deck)
+
+BENCHMARKS = [
+    Benchmark("load_vocab_file", bench_load),
+    Benchmark("validate_format", bench_validate),
+    Benchmark("near_duplicates", bench_near_duplicates),
+    Benchmark("load_deck", bench_load_deck, setup_cold_start),
+    Benchmark("load_deck_warm", bench_load_deck),
+    Benchmark("first_card", bench_first_card, setup_bytecode),
+    Benchmark("cli_stats", bench_cli_stats, setup_bytecode),
+    Benchmark("bucket_cold", bench_buckets, setup_cold_buckets),
+    Benchmark("bucket", bench_buckets),
+    Benchmark("print_formated", bench_render),
+    Benchmark("session", bench_session, setup_session),
+    Benchmark("server", bench_server, setup_server),
+    Benchmark("save_vocab", bench_save),
+]
+
+def measure(benchmark: Benchmark, case: Case, repeat: int) -> dict:
+    """Best time of `repeat` runs, then the peak memory of one traced run."""
+    best = float("inf")
+    for _ in range(repeat):
+        if benchmark.setup:
+            benchmark.setup(case)
+        start = time.perf_counter()
+        items = benchmark.run(case)
+        best = min(best, time.perf_counter() - start)
+
+    if benchmark.setup:
+        benchmark.setup(case)
+    tracemalloc.start()
+    benchmark.run(case)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"items": items, "seconds": best, "per_second": items / best if best else 0.0, "peak_mb": peak / 1e6}
+
+def run_benchmarks(sizes: List[int], repeat: int) -> dict:
+    results = {}
+    cwd = os.getcwd()
+    # Fixed terminal size, so renders do the same work on every machine
+    os.environ["COLUMNS"], os.environ["LINES"] = "120", "40"
+    with tempfile.TemporaryDirectory() as tmp:
+        # The trainer keeps its files relative to the working directory
+        os.chdir(tmp)
+        os.mkdir("src_and_data")
+        try:
+            for size in sizes:
+                case = Case(size, vt.Entry.path_all)
+                generate_deck(case.path, vt.Entry.path_progress, size)
+                for benchmark in BENCHMARKS:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        result = measure(benchmark, case, repeat)
+                    results[f"{benchmark.name}/{size}"] = result
+                    print(f"{benchmark.name:<16}{size:>10}  {result['seconds']:>9.4f}s  {result['per_second']:>12,.0f}/s  {result['peak_mb']:>8.1f} MB", flush=True)
+        finally:
+            os.chdir(cwd)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Names of the benchmarks that got slower than the baseline by more than `tolerance`."""
+    regressions = []
+    print(f"\n{'benchmark':<27}{'baseline':>10}{'now':>10}{'change':>9}")
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before, now = baseline[key]["seconds"], result["seconds"]
+        change = now / before - 1 if before else 0.0
+        # Ignore differences below 5 ms, they are timer and disk noise
+        regressed = change > tolerance and now - before > 0.005
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<27}{before:>9.4f}s{now:>9.4f}s{change:>+9.0%}{'  ❌ slower' if regressed else ''}")
+    return regressions
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the vocabulary trainer on synthetic decks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, metavar="N", help="deck sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the best one counts")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare against or store")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a benchmark counts as regressed")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    print(f"{'benchmark':<16}{'entries':>10}  {'time':>10}  {'throughput':>14}  {'peak':>11}")
+    results = run_benchmarks(args.sizes, args.repeat)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        vt.write_atomic(args.baseline, [json.dumps(baseline, indent=2, sort_keys=True) + "\n"])
+        print(f"\n✅ Saved the baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️ No baseline at {args.baseline}, store one with --save-baseline.")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmarks are slower than the baseline: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
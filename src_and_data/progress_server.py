@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Serve the progress of many learners of one shared deck over a local socket.
+
+The vocabulary is parsed once and kept in memory. Every learner gets its own
+flags and schedules on top of the shared entries (see `Deck.share`), stored
+in src_and_data/users/<name>/ just like `vocabulary_trainer.py --user <name>`
+does. The marks made here are appended to the user's journal, which the
+trainer replays and compacts like its own. The API is JSON over HTTP/1.1,
+on localhost or on a Unix socket:
+
+    python3 src_and_data/progress_server.py                      # http://127.0.0.1:8765
+    python3 src_and_data/progress_server.py --unix /tmp/vocab.sock
+
+    GET  /health                        entries and learners loaded
+    GET  /users/<name>/stats            entries per bucket and cards due
+    GET  /users/<name>/next             next card of the first non-empty bucket, or ?bucket=<bucket>|Due
+    GET  /users/<name>/cards/<id>       one card with its state
+    POST /users/<name>/cards/<id>       answer it: {"known": true, "important": false, "grade": 4}
+
+All requests run on one asyncio event loop, so the marks of concurrent
+clients never interleave. Learners are loaded on their first request.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sys
+import urllib.parse
+from http import HTTPStatus
+from typing import List, Literal, Tuple
+
+import vocabulary_trainer as vt
+
+DEFAULT_PORT = 8765
+MAX_BODY = 64 * 1024  # bytes of a request body
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class UserJournal(vt.Journal):
+    """The journal of a user, with the entries the trainer renamed journaled under their new ID."""
+
+    def __init__(self, path: str, renamed: dict[str, str]):
+        super().__init__(path)
+        self.renamed = renamed  # old ID -> newest ID
+
+    def append(self, op: Literal["state", "delete", "edit"], key: str, **fields):
+        super().append(op, self.renamed.get(key, key), **fields)
+
+class Learner:
+    """The progress of one user on the shared deck, with its journal and card rounds."""
+
+    def __init__(self, name: str, shared: vt.Deck):
+        paths = vt.user_paths(name)
+        self.name = name
+        self.progress_path = paths["path_progress"]
+        os.makedirs(os.path.dirname(self.progress_path), exist_ok=True)
+
+        self.deck = shared.share()
+        if os.path.exists(self.progress_path):
+            for key, state in vt.load_progress(self.progress_path).items():
+                entry = self.deck.get(key)
+                if entry is not None:
+                    self.deck.restore(entry, state)
+        # Deletes and edits of a trainer session would change the deck of everyone, only marks are replayed.
+        # New marks go to the end of the same journal, so the trainer replays everything in the order it happened
+        renamed = {}
+        if os.path.exists(paths["path_journal"]):
+            renamed = vt.replay_journal(self.deck, paths["path_journal"], ops=("state",))
+        self.deck.journal = UserJournal(paths["path_journal"], renamed)
+
+        self.scheduler = None
+        self.rounds = {}    # bucket -> shuffled round over the cards that were in it when the round started
+        self.empty = set()  # buckets found empty, until a card moves into them
+
+    def next_card(self, label: str | None = None) -> vt.Entry | None:
+        """The next card of `label`, of the due cards for 'Due', or of the first non-empty bucket."""
+        if label == "Due":
+            return self.get_scheduler().next_due()
+        for label in [label] if label else vt.BUCKETS:
+            entry = self.next_in(label)
+            if entry is not None:
+                return entry
+        return None
+
+    def next_in(self, label: str) -> vt.Entry | None:
+        # Cards that left the bucket since their round started are skipped, like in the trainer
+        round_ = self.rounds.get(label)
+        if round_ is not None:
+            for entry in round_:
+                if vt.bucket_of(self.deck.flags_of(entry)) == label:
+                    return entry
+        if label in self.empty:
+            return None
+        self.rounds[label] = round_ = vt.lazy_shuffle(self.deck.bucket(label))
+        entry = next(round_, None)
+        if entry is None:
+            self.empty.add(label)
+        return entry
+
+    def get_scheduler(self) -> vt.Scheduler:
+        if self.scheduler is None:
+            self.scheduler = vt.Scheduler(self.deck)
+        return self.scheduler
+
+    def answer(self, entry: vt.Entry, known: bool | None = None, important: bool | None = None, grade: int | None = None):
+        """Record an answer to `entry`: grade it for spaced repetition, mark it and journal the new state."""
+        if grade is not None:
+            self.get_scheduler().grade(entry, grade)
+        self.deck.mark(entry, known=known, seen=True, important=important)
+        self.empty.discard(vt.bucket_of(self.deck.flags_of(entry)))
+
+    def card(self, entry: vt.Entry) -> dict:
+        return {
+            "id": entry.id,
+            "question": entry.question,
+            "answer": entry.answer,
+            "bucket": vt.bucket_of(self.deck.flags_of(entry)),
+            "state": self.deck.state(entry),
+        }
+
+    def close(self):
+        # The journal is never truncated here, only the trainer compacts it with the edits and deletes it holds
+        self.deck.journal.close()
+
+class ProgressServer:
+    """Routes the API requests to the learners of one shared deck."""
+
+    def __init__(self, deck: vt.Deck):
+        self.deck = deck
+        self.learners = {}
+        self.requests = 0
+
+    def learner(self, name: str) -> Learner:
+        learner = self.learners.get(name)
+        if learner is None:
+            learner = self.learners[name] = Learner(name, self.deck)
+        return learner
+
+    def handle(self, method: str, target: str, body: bytes = b"") -> Tuple[int, dict]:
+        """Answer one request with a status code and a JSON payload; no sockets needed."""
+        self.requests += 1
+        url = urllib.parse.urlsplit(target)
+        parts = [urllib.parse.unquote(part) for part in url.path.strip("/").split("/")]
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if parts == ["health"]:
+                expect(method, "GET")
+                return 200, {"entries": len(self.deck), "learners": len(self.learners), "requests": self.requests}
+            if len(parts) < 3 or parts[0] != "users":
+                raise RequestError(404, f"Unknown path {url.path}")
+            learner = self.learner(parts[1])
+            if parts[2:] == ["stats"]:
+                expect(method, "GET")
+                return 200, vt.deck_stats(learner.deck)
+            if parts[2:] == ["next"]:
+                expect(method, "GET")
+                label = query.get("bucket")
+                if label is not None and label not in (*vt.BUCKETS, "Due"):
+                    raise RequestError(400, f"Unknown bucket '{label}', use one of {', '.join((*vt.BUCKETS, 'Due'))}")
+                entry = learner.next_card(label)
+                return 200, {"card": entry and learner.card(entry)}
+            if len(parts) == 4 and parts[2] == "cards":
+                entry = learner.deck.get(parts[3])
+                if entry is None:
+                    raise RequestError(404, f"No card with the ID {parts[3]}")
+                if method == "POST":
+                    learner.answer(entry, **parse_answer(body))
+                else:
+                    expect(method, "GET")
+                return 200, {"card": learner.card(entry)}
+            raise RequestError(404, f"Unknown path {url.path}")
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer the HTTP requests of one connection, keeping it open between them unless asked to close."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await respond(writer, 400, {"error": "Malformed request"}, keep_alive=False)
+                    break
+                if not 0 <= length <= MAX_BODY:
+                    await respond(writer, 413, {"error": f"The body may have at most {MAX_BODY} bytes"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = self.handle(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        for learner in self.learners.values():
+            learner.close()
+
+def expect(method: str, allowed: str):
+    if method != allowed:
+        raise RequestError(405, f"Use {allowed} here, not {method}")
+
+def parse_answer(body: bytes) -> dict:
+    """The known / important / grade fields of an answer, checked."""
+    try:
+        answer = json.loads(body or b"{}")
+    except ValueError:
+        raise RequestError(400, "The body is not valid JSON") from None
+    if not isinstance(answer, dict) or set(answer) - {"known", "important", "grade"}:
+        raise RequestError(400, "Send a JSON object with 'known', 'important' and/or 'grade'")
+    for name in ("known", "important"):
+        if answer.get(name) is not None and not isinstance(answer[name], bool):
+            raise RequestError(400, f"'{name}' must be true, false or null")
+    grade = answer.get("grade")
+    if grade is not None and (type(grade) is not int or not 0 <= grade <= 5):
+        raise RequestError(400, "'grade' must be a whole number from 0 (blackout) to 5 (perfect)")
+    return answer
+
+async def respond(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool = True):
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(data)}"]
+    if not keep_alive:
+        head.append("Connection: close")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+    await writer.drain()
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, target: str,
+                  payload: dict | None = None) -> Tuple[int, dict]:
+    """Send one request over an open connection and read the answer; a minimal client for scripts and tests."""
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def serve(server: ProgressServer, args: argparse.Namespace):
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.serve_client, path=args.unix)
+        where = args.unix
+    else:
+        # Only local clients, the API has no authentication
+        listener = await asyncio.start_server(server.serve_client, "127.0.0.1", args.port)
+        where = f"http://127.0.0.1:{args.port}"
+    print(f"✅ Serving {len(server.deck)} entries on {where}", flush=True)
+
+    # Stop cleanly on Ctrl+C and on kill, so the journals are synced
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):  # no signal handlers on Windows, Ctrl+C still works
+            loop.add_signal_handler(sig, stop.set)
+    async with listener:
+        await stop.wait()
+    print("\n✅ Stopped")
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve per-user progress on a shared deck to local clients.")
+    parser.add_argument("--deck", default=vt.Entry.path_all, help="vocabulary file shared by all users (default: %(default)s)")
+    parser.add_argument("--users", default=vt.Entry.path_users, help="folder of the per-user progress (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port on 127.0.0.1 (default: %(default)s)")
+    parser.add_argument("--unix", metavar="PATH", help="listen on this Unix socket instead of a port")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    vt.Entry.path_users = args.users
+    # The users' progress is loaded per learner, the shared deck starts without any
+    server = ProgressServer(vt.parse_deck(args.deck, progress={}))
+    try:
+        asyncio.run(serve(server, args))
+    except KeyboardInterrupt:
+        print("\n✅ Stopped")
+    finally:
+        server.close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Run trainer sessions without a terminal, from a recorded or generated keystroke script.
+
+The driver swaps the trainer's console for a `ScriptedConsole`, which answers
+every prompt with the next key of the script, records the frames the trainer
+draws and never sleeps. State changes are captured by a `MemoryJournal` in
+place of the deck's journal. Sessions work on a copy of the deck, so the
+vocabulary and progress files are never touched:
+
+    python3 src_and_data/session_driver.py --cards 20 --show-frames
+    python3 src_and_data/session_driver.py --sessions 1000 --cards 50
+    python3 src_and_data/session_driver.py --script keys.txt
+
+A script file holds one key per line, an empty line is ENTER.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List
+
+import vocabulary_trainer as vt
+
+class ScriptedConsole(vt.Console):
+    """A console that reads from a keystroke script and records what is written to it."""
+
+    def __init__(self, keys: Iterable[str], columns: int = 120, lines: int = 40, record: bool = True):
+        self.keys = iter(keys)
+        self.terminal_size = os.terminal_size((columns, lines))
+        self.record = record
+        self.output = []
+        self.screens = 0
+        self.slept = 0.0
+        self.reads = 0
+        self.response_times = []    # seconds from handing out a key to the next prompt
+        self.answered = None
+
+    def read(self, prompt: str = "") -> str:
+        now = time.perf_counter()
+        if self.answered is not None:
+            self.response_times.append(now - self.answered)
+        self.write(prompt)
+        try:
+            key = next(self.keys)
+        except StopIteration:
+            raise EOFError("The keystroke script has ended.") from None
+        self.reads += 1
+        self.answered = time.perf_counter()
+        return key
+
+    def write(self, text: str):
+        self.screens += text.count(vt.CLEAR_SCREEN)
+        if self.record:
+            self.output.append(text)
+
+    def flush(self):
+        pass
+
+    def sleep(self, seconds: float):
+        self.slept += seconds
+
+    def size(self) -> os.terminal_size:
+        return self.terminal_size
+
+    @property
+    def frames(self) -> List[str]:
+        """Every screen the trainer drew, one per screen clear."""
+        return "".join(self.output).split(vt.CLEAR_SCREEN)[1:]
+
+class MemoryJournal:
+    """Stands in for the deck's Journal and keeps its records in memory."""
+
+    def __init__(self):
+        self.records = []
+
+    def append(self, op: str, key: str, **fields):
+        self.records.append({"op": op, "id": key, **fields})
+
+    def sync(self):
+        pass
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def close(self):
+        pass
+
+@dataclass
+class SessionResult:
+    exit_code: str | None       # "q" | "m" | "s" | None, also None if the script ended first
+    keys: int
+    cards: int                  # screens drawn, one per card shown
+    seconds: float
+    slept: float
+    frames: List[str] = field(repr=False)
+    transitions: List[dict] = field(repr=False)
+    response_times: List[float] = field(repr=False)
+
+def copy_deck(deck: vt.Deck) -> vt.Deck:
+    """An independent copy of `deck`, so edits and deletes in a session do not leak into the next one."""
+    copy = vt.Deck()
+    for entry in deck:
+        copy.add(vt.Entry(entry.question, entry.answer), deck.state(entry))
+    return copy
+
+def run_session(deck: vt.Deck, keys: Iterable[str], label: str = "Unseen", scheduler: vt.Scheduler | None = None,
+                columns: int = 120, lines: int = 40, record: bool = True) -> SessionResult:
+    """Run one `run_trainer` round on `deck`, answering its prompts from `keys`."""
+    scripted = ScriptedConsole(keys, columns, lines, record)
+    journal = MemoryJournal()
+    saved = vt.console, deck.journal, vt.vocab_total
+    vt.console, deck.journal, vt.vocab_total = scripted, journal, len(deck)
+    vt.take_status()
+    start = time.perf_counter()
+    try:
+        _, exit_code = vt.run_trainer(deck, label, scheduler)
+    except EOFError:
+        exit_code = None
+    finally:
+        seconds = time.perf_counter() - start
+        vt.console, deck.journal, vt.vocab_total = saved
+    return SessionResult(exit_code, scripted.reads, scripted.screens, seconds, scripted.slept,
+                         scripted.frames if record else [], journal.records, scripted.response_times)
+
+def generate_keys(rng: random.Random, cards: int) -> List[str]:
+    """A keystroke script that reveals and answers `cards` cards, with a few marks, edits and deletes, then quits."""
+    keys = []
+    for n in range(cards):
+        keys.append("")  # reveal the answer
+        roll = rng.random()
+        if roll < 0.04:
+            keys += ["e", "y", f"Q: Edited question {n}", "#", "A: Edited answer", "#", "y", ""]
+        elif roll < 0.08:
+            keys += ["d", "y"]
+        elif roll < 0.20:
+            keys.append("i")
+        else:
+            keys.append(rng.choice(("", "#")))
+    keys.append("")
+    keys.append("q")
+    return keys
+
+def read_script(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+def percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run trainer sessions from a keystroke script, without a terminal.")
+    parser.add_argument("--deck", default="src_and_data/vocabulary.txt", help="vocabulary file to train on (default: %(default)s)")
+    parser.add_argument("--label", default="Unseen", choices=vt.BUCKETS, help="bucket to train (default: %(default)s)")
+    parser.add_argument("--script", help="keystroke file, one key per line, an empty line is ENTER")
+    parser.add_argument("--cards", type=int, default=20, help="cards per generated session (default: %(default)s)")
+    parser.add_argument("--sessions", type=int, default=1, help="number of sessions to run (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated scripts and shuffles")
+    parser.add_argument("--show-frames", action="store_true", help="print the frames of the last session")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # lazy_shuffle uses the shared generator of the random module
+    deck = vt.Deck()
+    for entry in vt.iter_vocab_file(args.deck):
+        deck.add(entry)
+    script = read_script(args.script) if args.script else None
+
+    results = []
+    start = time.perf_counter()
+    for _ in range(args.sessions):
+        keys = script if script is not None else generate_keys(rng, args.cards)
+        results.append(run_session(copy_deck(deck), keys, args.label, record=args.show_frames or args.sessions == 1))
+    elapsed = time.perf_counter() - start
+
+    response_times = [t for r in results for t in r.response_times]
+    ops = {}
+    for r in results:
+        for record in r.transitions:
+            ops[record["op"]] = ops.get(record["op"], 0) + 1
+    keys = sum(r.keys for r in results)
+
+    if args.show_frames:
+        for n, frame in enumerate(results[-1].frames, start=1):
+            print(f"----- frame {n} -----")
+            print(frame)
+    print(f"✅ {len(results)} sessions, {keys} keys in {elapsed:.3f}s ({len(results) / elapsed:,.0f} sessions/s, {keys / elapsed:,.0f} keys/s)")
+    if response_times:
+        print(f"   Response per key: median {statistics.median(response_times) * 1e6:,.0f} µs, "
+              f"p95 {percentile(response_times, 0.95) * 1e6:,.0f} µs, max {max(response_times) * 1e6:,.0f} µs")
+    print(f"   State transitions: {', '.join(f'{n} {op}' for op, n in sorted(ops.items())) or 'none'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
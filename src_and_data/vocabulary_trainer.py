@@ -1,46 +1,326 @@
 #!/usr/bin/env python3
 
+import argparse
+import bisect
+import contextlib
+import functools
+import hashlib
+import heapq
+import itertools
+import json
+import marshal
+import math
+import mmap
 import os
 import re
 import sys
-from dataclasses import dataclass
-import time
-from pathlib import Path
 import textwrap
-import shutil
-import shutil
-import textwrap
-import random
-from typing import List, Literal, Tuple
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Literal, Tuple
+
+# gzip, pathlib, random and shutil are imported by the functions that need them,
+# so starting a session or a subcommand does not pay for them up front.
 
 # ___________ Variables ___________
-terminal_width, terminal_height = shutil.get_terminal_size()
-left_bound_text_box = max(terminal_width // 2 - 20, 0)
-right_bound_text_box = max(terminal_width // 2 + 20, 0)
 text_box_size = 100
 vocab_total = 0
+journal_sync_every = 10         # fsync the journal after this many records
+journal_compact_after = 1000    # rewrite the deck once the journal holds this many records
+near_duplicate_threshold = 0.7  # Jaccard similarity of question shingles to count as near duplicate
+srs_relearn_delay = 60          # seconds until a forgotten card is due again
+feedback_delay = 0.0            # seconds to hold a confirmation, 0 = carry it into the next frame instead
+status_message = ""             # confirmation shown in the next frame
+mmap_min_size = 8 * 1024 * 1024 # map vocabulary files of at least this many bytes instead of keeping their text in memory
+prefetch_depth = 3              # upcoming cards rendered in the background while waiting for input, 0 = off
+backup_keep_latest = 10         # newest backups that are always kept
+backup_retention = (            # (period in seconds, how many periods) of older backups to keep
+    (3600, 24),                 # one per hour for a day
+    (86400, 7),                 # one per day for a week
+    (7 * 86400, 8),             # one per week for two months
+)
 
 
 @dataclass
+class Schedule:
+    ease: float = 2.5
+    interval: float = 0.0   # days
+    reps: int = 0           # successful reviews in a row
+    due: float = 0.0        # unix time, 0 = never reviewed
+
+
+@dataclass(eq=False, slots=True)
 class Entry:
+    """The text of one vocabulary entry. Its progress is kept by the Deck."""
     question: str
     answer: str
-    known: bool = None
-    seen: bool = None
-    important = None
 
+    @property
+    def id(self) -> str:
+        return entry_id(self.question)
+
+    path_progress = "src_and_data/progress.txt"
+    path_journal = "src_and_data/progress.journal"
+    path_snapshot = "src_and_data/deck.snapshot"
     path_known = "src_and_data/known.txt"
     path_not_known = "src_and_data/not_known.txt"
     path_important = "src_and_data/important.txt"
     path_all = "src_and_data/vocabulary.txt"
     path_backup = "src_and_data/vocabulary_backup"
+    path_users = "src_and_data/users"
+
+# Progress files that belong to one learner; the vocabulary and its backups are shared
+USER_FILES = ("path_progress", "path_journal", "path_snapshot", "path_known", "path_not_known", "path_important")
+USER_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+def user_paths(user: str) -> dict[str, str]:
+    """The progress files of `user`, named like the default ones but in its own folder below `Entry.path_users`."""
+    if not USER_PATTERN.fullmatch(user):
+        raise ValueError(f"❌ Invalid user name '{user}': use up to 64 letters, digits, '.', '_' and '-'.")
+    folder = os.path.join(Entry.path_users, user)
+    return {name: os.path.join(folder, os.path.basename(getattr(Entry, name))) for name in USER_FILES}
+
+def select_user(user: str):
+    """Keep the progress of this session in the folder of `user` instead of next to the vocabulary."""
+    paths = user_paths(user)
+    os.makedirs(os.path.dirname(paths["path_progress"]), exist_ok=True)
+    for name, path in paths.items():
+        setattr(Entry, name, path)
+
+def entry_id(question: str) -> str:
+    """Stable per-entry ID, derived from the question text."""
+    return hashlib.blake2b(question.encode("utf-8"), digest_size=8).hexdigest()
+
+class MappedEntry(Entry):
+    """An entry whose text stays in the memory-mapped vocabulary file.
+
+    Only the byte range of its Q/A block is kept; question and answer are
+    decoded each time they are read. Edited text is held in memory instead.
+    """
+    __slots__ = ("source", "offset", "length", "_id", "_question", "_answer")
+
+    def __init__(self, source: mmap.mmap, offset: int, length: int, key: str):
+        self.source = source
+        self.offset = offset
+        self.length = length
+        self._id = key
+        self._question = None
+        self._answer = None
+
+    def _answer_offset(self) -> int:
+        # Question lines never start with 'A:', so the first one starts the answer
+        return self.source.find(b"\nA:", self.offset, self.offset + self.length) + 1
+
+    @staticmethod
+    def _decode(raw: bytes) -> str:
+        # Same text as the parser's "\n".join() of the lines without their line breaks
+        text = raw.decode("utf-8").replace("\r\n", "\n")
+        return text[:-1] if text.endswith("\n") else text
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def question(self) -> str:
+        if self._question is not None:
+            return self._question
+        return self._decode(self.source[self.offset:self._answer_offset()])
+
+    @question.setter
+    def question(self, text: str):
+        self._question = text
+        self._id = entry_id(text)
+
+    @property
+    def answer(self) -> str:
+        if self._answer is not None:
+            return self._answer
+        return self._decode(self.source[self._answer_offset():self.offset + self.length])
+
+    @answer.setter
+    def answer(self, text: str):
+        self._answer = text
+
+def map_file(path: str) -> mmap.mmap | None:
+    """Map `path` read-only, or None if it is empty."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        # The mapping keeps the file's contents even after it is replaced by save_vocab
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+CLEAR_SCREEN = "\033[H\033[2J\033[3J"  # Move cursor home, clear the screen and the scrollback
+CLEAR_LINE = "\033[F\033[K"  # Move cursor up one line and clear the line
+
+class Console:
+    """The terminal the trainer reads keys from and draws on.
+
+    Everything interactive goes through the module's `console`, so replacing
+    it (see session_driver.py) runs the trainer without a terminal.
+    """
+
+    def read(self, prompt: str = "") -> str:
+        return input(prompt)
+
+    def write(self, text: str):
+        sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def size(self) -> os.terminal_size:
+        import shutil
+        return shutil.get_terminal_size()
+
+console = Console()
+
+class _Phase:
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profiler._exit()
+
+class Profiler:
+    """Opt-in timers and counters for the phases of a session, enabled with --profile.
+
+    Phases nest, and each one is only charged the time spent in it outside
+    of its inner phases, so a card render during a training round is not
+    counted twice. While disabled, every hook returns right away.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.seconds = {}
+        self.counts = {}
+        self.stack = []  # [phase, start of its current time slice]
+        self.first_card = None
+        self.cprofile = None
+
+    def enable(self, cprofile: bool = False):
+        self.enabled = True
+        if cprofile:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        return _Phase(self, name) if self.enabled else contextlib.nullcontext()
+
+    def _enter(self, name: str):
+        now = time.perf_counter()
+        if self.stack:
+            outer = self.stack[-1]
+            self.seconds[outer[0]] += now - outer[1]
+        self.stack.append([name, now])
+        self.seconds.setdefault(name, 0.0)
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _exit(self):
+        now = time.perf_counter()
+        name, start = self.stack.pop()
+        self.seconds[name] += now - start
+        if self.stack:
+            self.stack[-1][1] = now
+
+    def iterate(self, name: str, items: Iterable) -> Iterable:
+        """Charge the time spent producing each item of `items` to the phase `name`."""
+        if not self.enabled:
+            return items
+        return self._iterate(name, iter(items))
+
+    def _iterate(self, name: str, iterator: Iterator) -> Iterator:
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def card_shown(self):
+        if self.enabled and self.first_card is None:
+            self.first_card = time.perf_counter() - self.started
+
+    def report(self) -> dict:
+        phases = sorted(self.seconds, key=self.seconds.get, reverse=True)
+        return {
+            "session_seconds": round(time.perf_counter() - self.started, 6),
+            "time_to_first_card": None if self.first_card is None else round(self.first_card, 6),
+            "phases": {name: {"seconds": round(self.seconds[name], 6), "count": self.counts[name]} for name in phases},
+        }
+
+    def write_report(self, path: str):
+        """Write the phase report as JSON, or the cProfile statistics if `path` ends in .prof."""
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(path)
+        else:
+            write_atomic(path, [json.dumps(self.report(), indent=2) + "\n"])
+        print(f"✅ Profile written to {path}")
+        if self.first_card is not None:
+            print(f"   Time to first card: {self.first_card:.3f}s")
+        for name, phase in self.report()["phases"].items():
+            print(f"   {name:<10}{phase['seconds']:>10.4f}s {phase['count']:>8}x")
+
+profiler = Profiler()
+
+def profiled(name: str):
+    """Charge the calls of the decorated function to the phase `name` while profiling."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@profiled("input")
+def read_key(prompt: str = "") -> str:
+    return console.read(prompt)
+
+def write_frame(*parts: str):
+    """Write all parts of a frame with one write and one flush, so it shows up at once."""
+    console.write("".join(parts))
+    console.flush()
 
 def clear():
-    os.system('clear' if os.name == 'posix' else 'cls')
+    write_frame(CLEAR_SCREEN)
+
+def pause():
+    if feedback_delay > 0:
+        console.sleep(feedback_delay)
+
+def show_feedback(message: str):
+    """Show a confirmation now and keep it on screen in the next frame."""
+    global status_message
+    status_message = message
+    write_frame(message, "\n")
+    pause()
+
+def take_status() -> str:
+    global status_message
+    message, status_message = status_message, ""
+    return message
 
 def clear_line():
-    sys.stdout.write("\033[F\033[K")  # Move cursor up one line and clear the line
-    sys.stdout.flush()  # Ensure the command is executed immediately
+    # No flush here, the next write or input() prompt flushes it together with its own output
+    console.write(CLEAR_LINE)
 
 def activate_ansi_escapes(string):
     # Turn the literal escape sequences into real ANSI escapes
@@ -49,43 +329,36 @@ def activate_ansi_escapes(string):
             .replace(r"\x1b", "\x1b"))  # \x1b  -> ESC
     return string
 
-def print_formated(
+# Escape sequences
+STYLES = {
+    "BOLD": "\033[1m",
+    "NORMAL": "\033[0m"
+}
+
+COLOURS = {
+    "WHITE": "\033[97m",
+    "CYAN": "\033[36m",
+    "BLUE": "\033[38;5;117m",
+    "GREEN": "\033[38;5;151m",
+    "RED": "\033[38;5;210m"
+}
+
+RESET = "\033[0m"
+UNDERLINE = "\033[4m"
+
+def format_text(
         string: str, colour: Literal["WHITE", "CYAN", "BLUE", "GREEN", "RED"], 
         style: Literal["BOLD", "NORMAL"], 
-        position: Literal["LEFT", "CENTER", "RIGHT"] = "LEFT"
-        ):
+        position: Literal["LEFT", "CENTER", "RIGHT"] = "LEFT",
+        terminal_width: int | None = None
+        ) -> str:
     
     # Terminal dimensions
-    terminal_width, _ = shutil.get_terminal_size()
-    
+    if terminal_width is None:
+        terminal_width = console.size().columns
 
-    # Escape sequences
-    STYLES = {
-        "BOLD": "\033[1m",
-        "NORMAL": "\033[0m"
-    }
-
-    COLOURS = {
-        "WHITE": "\033[97m",
-        "CYAN": "\033[36m",
-        "BLUE": "\033[38;5;117m",
-        "GREEN": "\033[38;5;151m",
-        "RED": "\033[38;5;210m"
-    }
-
-    RESET = "\033[0m"
-    UNDERLINE = "\033[4m"
-
-
-    if string.startswith("Q:"):
-        is_question = True
-    else:
-        is_question = False
-    if string.startswith("A:"):
-        is_answer = True
-    else:
-        is_answer = False
-                         
+    is_question = string.startswith("Q:")
+    is_answer = string.startswith("A:")
 
     # Wrap first (no styling yet)
     wrapped_lines = []
@@ -96,16 +369,13 @@ def print_formated(
     indent = " " * max(terminal_width // 2 - text_box_size // 2, 0)
 
     # Apply formatting line by line
-    formatted_lines = []
-    for i, line in enumerate(wrapped_lines):
-        styled = line
-        if is_question:
-            styled = f"{STYLES['BOLD']}{UNDERLINE}{line}{RESET}" 
-        elif is_answer:
-            styled = f"{STYLES['BOLD']}{COLOURS['WHITE']}{line}{RESET}"
-        else:
-            styled = f"{STYLES[style]}{COLOURS[colour]}{line}{RESET}"
-        formatted_lines.append(indent + styled)
+    if is_question:
+        prefix = f"{STYLES['BOLD']}{UNDERLINE}"
+    elif is_answer:
+        prefix = f"{STYLES['BOLD']}{COLOURS['WHITE']}"
+    else:
+        prefix = f"{STYLES[style]}{COLOURS[colour]}"
+    formatted_lines = [f"{indent}{prefix}{line}{RESET}" for line in wrapped_lines]
     
     if is_question or is_answer:
         final_output = "\n\n".join(formatted_lines)
@@ -116,14 +386,125 @@ def print_formated(
     # Activate ANSI sequences
     final_output = activate_ansi_escapes(final_output)
 
-    if position == "LEFT":
-        print(final_output)
-    elif position == "CENTER":
-        print(final_output.center(terminal_width))
+    if position == "CENTER":
+        final_output = final_output.center(terminal_width)
     elif position == "RIGHT":
-        terminal_width, _ = shutil.get_terminal_size()
-        print(final_output.rjust(terminal_width-len(indent)))
-   
+        final_output = final_output.rjust(terminal_width-len(indent))
+    return final_output
+
+def print_formated(
+        string: str, colour: Literal["WHITE", "CYAN", "BLUE", "GREEN", "RED"], 
+        style: Literal["BOLD", "NORMAL"], 
+        position: Literal["LEFT", "CENTER", "RIGHT"] = "LEFT"
+        ):
+    console.write(format_text(string, colour, style, position) + "\n")
+
+class RenderCache:
+    """LRU cache of formatted card text, keyed by (entry ID, terminal width, role).
+
+    A resized terminal clears the whole cache, an edited or deleted entry is
+    dropped through `invalidate`. The cache is shared with the prefetch
+    thread: text is formatted outside the lock, and only stored if no
+    invalidation happened meanwhile, so stale text never gets in.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.terminal_width = None
+        self.generation = 0  # bumped by every invalidation
+        self.lock = threading.Lock()
+
+    @profiled("card")
+    def get(self, entry: "Entry", role: Literal["question", "answer"], terminal_width: int) -> str:
+        return self.render(entry, role, terminal_width)
+
+    def render(self, entry: "Entry", role: Literal["question", "answer"], terminal_width: int) -> str:
+        """`get` without profiling, for the prefetch thread."""
+        key = (entry.id, terminal_width, role)
+        with self.lock:
+            if terminal_width != self.terminal_width:
+                self.items.clear()
+                self.terminal_width = terminal_width
+                self.generation += 1
+            text = self.items.get(key)
+            if text is not None:
+                self.items.move_to_end(key)
+                return text
+            generation = self.generation
+
+        text = format_text(getattr(entry, role), colour="WHITE", style="BOLD", terminal_width=terminal_width) + "\n"
+        with self.lock:
+            if generation == self.generation:
+                self.items[key] = text
+                if len(self.items) > self.maxsize:
+                    self.items.popitem(last=False)
+        return text
+
+    def invalidate(self, key: str):
+        with self.lock:
+            self.generation += 1
+            for role in ("question", "answer"):
+                self.items.pop((key, self.terminal_width, role), None)
+
+render_cache = RenderCache()
+
+class Prefetcher:
+    """Renders the cards the trainer needs next into `render_cache` on a worker thread.
+
+    The trainer hands over the upcoming cards right before it blocks on
+    input, so the answer and the next questions are formatted while the user
+    is reading. A new request replaces the one still being worked on.
+    """
+
+    def __init__(self):
+        self.pending = None
+        self.ready = threading.Condition()
+        self.thread = None
+
+    def request(self, items: List[Tuple["Entry", str]], terminal_width: int):
+        with self.ready:
+            self.pending = (items, terminal_width)
+            self.ready.notify()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.ready:
+                while self.pending is None:
+                    self.ready.wait()
+                items, terminal_width = self.pending
+                self.pending = None
+            for entry, role in items:
+                if self.pending is not None:
+                    break
+                render_cache.render(entry, role, terminal_width)
+
+prefetcher = Prefetcher()
+
+class Lookahead:
+    """Iterator over `items` that can peek at the upcoming items without consuming them."""
+
+    def __init__(self, items: Iterable):
+        self.items = iter(items)
+        self.buffer = deque()
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        return self.buffer.popleft() if self.buffer else next(self.items)
+
+    def peek(self, n: int) -> list:
+        while len(self.buffer) < n:
+            try:
+                self.buffer.append(next(self.items))
+            except StopIteration:
+                break
+        return list(itertools.islice(self.buffer, n))
+
 def validate_format(entries: list[Entry]):
     for entry in entries:
         q_marker = entry.question[:2]
@@ -133,45 +514,711 @@ def validate_format(entries: list[Entry]):
             return       
     print("✅ Format validated successfully.")
             
-def load_vocab_file(path: str) -> List[Entry]:
-    with open(path, "r") as f:
-        lines = f.read().splitlines()
-
-    entry_list = []
-    i = 0
-    while i < len(lines):
-        if not lines[i].startswith("Q:"):
-            raise ValueError(f"❌ Format error: Expected 'Q:' at line {i+1}, found: {lines[i]}")
-        question = []
-        while i < len(lines) and not lines[i].startswith("A:"):
-            question.append(lines[i])
-            i += 1
-            if i >= len(lines):
-                raise ValueError("❌ Format error: 'A:' missing after question block.")
-            
+def _parse_blocks(f, path: str, start: int = 0, end: int | None = None, first_line: int = 1) -> Iterator[Tuple[Entry, int, int, int]]:
+    """Parse the Q/A blocks of the binary file `f` from byte `start` up to byte `end`.
+
+    Yields (entry, byte offset, byte length, line number) per block. The
+    'Q:' / 'A:' markers are validated while reading, so errors point at the
+    exact line and the file never has to be held in memory as a whole.
+    """
+    question = []
+    answer = []
+    question_line = 0
+    question_offset = start
+    in_answer = False
+    offset = start
+
+    f.seek(start)
+    for line_no, raw in enumerate(f, start=first_line):
+        if end is not None and offset >= end:
+            break
+        line = raw.decode("utf-8").rstrip("\r\n")
+
+        if line.startswith("Q:"):
+            if question:
+                if not in_answer:
+                    raise ValueError(f"❌ Format error in {path}: 'A:' missing after question block at line {question_line}, found another 'Q:' at line {line_no}.")
+                entry = _build_entry(question, answer, question_line)
+                if entry:
+                    yield entry, question_offset, offset - question_offset, question_line
+            question = [line]
+            answer = []
+            question_line = line_no
+            question_offset = offset
+            in_answer = False
+        elif not question:
+            raise ValueError(f"❌ Format error in {path}: Expected 'Q:' at line {line_no}, found: {line}")
+        elif in_answer or line.startswith("A:"):
+            in_answer = True
+            answer.append(line)
+        else:
+            question.append(line)
+        offset += len(raw)
+
+    if question:
+        if not in_answer:
+            raise ValueError(f"❌ Format error in {path}: 'A:' missing after question block at line {question_line}.")
+        entry = _build_entry(question, answer, question_line)
+        if entry:
+            yield entry, question_offset, offset - question_offset, question_line
+
+def iter_vocab_blocks(path: str) -> Iterator[Tuple[Entry, int, int, int]]:
+    with open(path, "rb") as f:
+        yield from _parse_blocks(f, path)
+
+def iter_vocab_file(path: str) -> Iterator[Entry]:
+    """Parse a vocabulary file line by line and yield one Entry per Q/A block."""
+    for entry, _, _, _ in iter_vocab_blocks(path):
+        yield entry
+
+def iter_vocab_ranges(path: str, ranges: Iterable[Tuple[int, int, int]]) -> Iterator[Tuple[Entry, int, int, int]]:
+    """Parse only the given (byte offset, byte length, line number) ranges of a vocabulary file."""
+    with open(path, "rb") as f:
+        for offset, length, line_no in ranges:
+            yield from _parse_blocks(f, path, offset, offset + length, line_no)
+
+def _build_entry(question: List[str], answer: List[str], line_no: int) -> Entry | None:
+    q_text = "\n".join(question)
+    a_text = "\n".join(answer)
+
+    if q_text and a_text:
+        return Entry(question=q_text, answer=a_text)
+    print(f"⚠️ Skipped: Incomplete entry at line {line_no} → Q='{q_text}' A='{a_text}'")
+    return None
 
-        answer = []
-        while i < len(lines) and not lines[i].startswith("Q:"):
-            answer.append(lines[i])
-            i += 1
+def load_vocab_file(path: str) -> List[Entry]:
+    return list(iter_vocab_file(path))
 
-        q_text = "\n".join(question)
-        a_text = "\n".join(answer)
+CHAPTER_PATTERN = re.compile(r"\[([^\]]*)\]")
 
+def chapter_of(question: str) -> str:
+    """The last [chapter] tag of a question, or '' if it has none."""
+    tags = CHAPTER_PATTERN.findall(question)
+    return tags[-1].strip() if tags else ""
 
-        if q_text and a_text:
-            entry_list.append(Entry(question=q_text, answer=a_text))
-        else:
-            print(f"⚠️ Skipped: Incomplete entry → Q='{q_text}' A='{a_text}'")
+CHAPTER_INDEX_VERSION = 2  # 2: duplicate questions are left out
 
-    return entry_list
+def build_chapter_index(path: str) -> dict[str, List[List[int]]]:
+    """Map every chapter to the byte ranges of its entries, as [offset, length, line number, entries] runs.
 
-def print_header(mode="Trainer", current=0, local_total=0):
-    terminal_width, terminal_height = shutil.get_terminal_size()
-    global vocab_total
-    clear()
+    Duplicates are left out like in a full load, also across chapters, so a
+    chapter session never trains a copy the next full start drops.
+    """
+    chapters = {}
+    last_chapter = None
+    seen_questions = set()
+    for entry, offset, length, line_no in iter_vocab_blocks(path):
+        key = normalize_question(entry.question)
+        if key in seen_questions:
+            last_chapter = None  # the next entry starts a new run after the gap
+            continue
+        seen_questions.add(key)
+        chapter = chapter_of(entry.question)
+        runs = chapters.setdefault(chapter, [])
+        if chapter == last_chapter:
+            # Entries of the same chapter in a row share one run
+            runs[-1][1] += length
+            runs[-1][3] += 1
+        else:
+            runs.append([offset, length, line_no, 1])
+        last_chapter = chapter
+    return chapters
+
+def load_chapter_index(path: str) -> dict[str, List[List[int]]]:
+    """Read the chapter index next to the vocabulary file, rebuilding it if the file changed."""
+    index_path = f"{path}.chapters"
+    stat = os.stat(path)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if (index["version"], index["size"], index["mtime_ns"]) == (CHAPTER_INDEX_VERSION, stat.st_size, stat.st_mtime_ns):
+            return index["chapters"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    chapters = build_chapter_index(path)
+    index = {"version": CHAPTER_INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chapters": chapters}
+    write_atomic(index_path, [json.dumps(index, ensure_ascii=False)])
+    return chapters
+
+def select_chapters(chapters: Iterable[str], selectors: List[str]) -> List[str]:
+    """Chapters starting with any of `selectors`; '3' selects '3.1 ...' and '3.2 ...' but '3.1' not '3.10 ...'."""
+    patterns = [re.compile(re.escape(selector.strip().lower()) + r"(?!\w)") for selector in selectors]
+    return [c for c in chapters if any(p.match(c.lower()) for p in patterns)]
+
+def print_chapters(path: str):
+    for chapter, runs in load_chapter_index(path).items():
+        print(f"{sum(run[3] for run in runs):>6}  {chapter or '(no chapter)'}")
+
+def load_question_set(path: str) -> set[str]:
+    if not os.path.exists(path):
+        return set()
+    print(path)
+    questions = {e.question for e in iter_vocab_file(path)}
+    print("✅ Format validated successfully.")
+    return questions
+
+# [chapter] tags and punctuation, both ignored when comparing questions
+NOISE_PATTERN = re.compile(r"\[[^\]]*\]|[^\w\s]")
+
+def normalized_words(question: str) -> List[str]:
+    text = question[2:] if question.startswith("Q:") else question
+    return NOISE_PATTERN.sub(" ", text.lower()).split()
+
+def normalize_question(question: str) -> str:
+    """Question text without 'Q:', [chapter] tags, case, punctuation and extra spaces."""
+    return " ".join(normalized_words(question))
+
+def question_shingles(question: str) -> set[str]:
+    """The word pairs (or the single word) of the normalized question."""
+    words = normalized_words(question)
+    if len(words) < 2:
+        return set(words)
+    return set(map(" ".join, zip(words, words[1:])))
+
+def find_near_duplicates(entries: List[Entry], threshold: float | None = None) -> List[List[Entry]]:
+    """Group entries whose questions have a Jaccard similarity of at least `threshold`.
+
+    Uses prefix filtering: with the shingles of every question ordered from
+    rarest to most common, two questions this similar always share one of
+    the first `len - ceil(threshold * len) + 1` shingles of each. Only
+    questions sharing such a prefix shingle are compared, and shingles no
+    other question has are never indexed at all. Results do not depend on
+    the hash seed, and no similar pair is missed.
+    """
+    threshold = near_duplicate_threshold if threshold is None else threshold
+    shingles = [question_shingles(e.question) for e in entries]
+    counts = Counter(itertools.chain.from_iterable(shingles))
+    unique = {shingle for shingle, count in counts.items() if count == 1}
+
+    # Union-find over entry indices
+    parent = list(range(len(entries)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    index = {}  # shingle -> entries with it in their prefix
+    for i, sh in enumerate(shingles):
+        # The unique shingles are the rarest, they fill the start of the prefix without matching anything
+        shared = sh - unique
+        prefix_length = len(sh) - math.ceil(threshold * len(sh) - 1e-9) + 1 - (len(sh) - len(shared))
+        if prefix_length <= 0:
+            continue
+        # Rarest first, equally rare ones alphabetically, so every question uses the same order
+        prefix = sorted(sorted(shared), key=counts.get)[:prefix_length]
+        for shingle in prefix:
+            others = index.setdefault(shingle, [])
+            for j in others:
+                a, b = find(j), find(i)
+                if a != b and len(sh & shingles[j]) / len(sh | shingles[j]) >= threshold:
+                    parent[b] = a
+            others.append(i)
+
+    clusters = {}
+    for i in range(len(entries)):
+        clusters.setdefault(find(i), []).append(entries[i])
+    return [c for c in clusters.values() if len(c) > 1]
+
+def print_near_duplicates(entries: List[Entry]):
+    clusters = find_near_duplicates(entries)
+    for n, cluster in enumerate(clusters, start=1):
+        print_formated(f"Cluster {n}:", colour="CYAN", style="BOLD")
+        for entry in cluster:
+            print_formated(entry.question, colour="WHITE", style="NORMAL")
+        print()
+    print(f"⚠️ Found {len(clusters)} clusters of near duplicate questions." if clusters else "✅ No near duplicate questions found.")
+
+# Progress flags of an entry, packed into one byte per deck slot
+KNOWN = 1
+SEEN = 2
+IMPORTANT = 4
+DELETED = 8
+FLAG_LETTERS = ((KNOWN, "k"), (SEEN, "s"), (IMPORTANT, "i"))
+
+def encode_state(flags: int, schedule: Schedule | None) -> str:
+    state = "".join(letter for flag, letter in FLAG_LETTERS if flags & flag) or "-"
+    if schedule:
+        s = schedule
+        state += f" {round(s.ease, 3)} {round(s.interval, 3)} {s.reps} {int(s.due)}"
+    return state
+
+def decode_state(state: str) -> Tuple[int, Schedule | None]:
+    fields = state.split()
+    letters = fields[0] if fields else ""
+    flags = sum(flag for flag, letter in FLAG_LETTERS if letter in letters)
+    if len(fields) == 5:
+        return flags, Schedule(float(fields[1]), float(fields[2]), int(fields[3]), float(fields[4]))
+    return flags, None
+
+def load_progress(path: str) -> dict[str, str]:
+    """Read the progress store: one '<id> <flags> [<ease> <interval> <reps> <due>]' record per line.
+
+    Flags are any of 'k' (known), 's' (seen) and 'i' (important), or '-' for
+    none. The spaced repetition fields are only present for entries that were
+    reviewed in the 'Due' mode. Entries without a record are unseen.
+    """
+    progress = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            key, _, state = line.partition(" ")
+            fields = state.split()
+            if not key or len(fields) not in (1, 5) or set(fields[0]) - set("ksi-"):
+                raise ValueError(f"❌ Format error in {path}: Invalid progress record at line {line_no}: {line}")
+            progress[key] = state
+    return progress
+
+def migrate_legacy_progress() -> dict[str, str]:
+    """Build progress records from the old known/not_known/important files."""
+    known_question_set = load_question_set(Entry.path_known)
+    not_known_question_set = load_question_set(Entry.path_not_known)
+    important_question_set = load_question_set(Entry.path_important)
+
+    progress = {}
+    for question in not_known_question_set:
+        progress[entry_id(question)] = "s"
+    for question in known_question_set:
+        progress[entry_id(question)] = "ks"
+    for question in important_question_set:
+        key = entry_id(question)
+        progress[key] = progress.get(key, "") + "i"
+    if progress:
+        print(f"✅ Migrated {len(progress)} progress records from known/not_known/important files.")
+    return progress
+
+def write_atomic(path: str, lines: Iterable[str]):
+    # Write to a temp file first so a crash never leaves a half written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+
+class Journal:
+    """Append-only log of the changes made during a session.
+
+    Every mark, delete and edit is appended as one JSON line and flushed right
+    away, so it survives a crash of the trainer. The file is fsynced every
+    `journal_sync_every` records. On the next start the journal is replayed on
+    top of vocabulary.txt and progress.txt, and `compact` folds it back into
+    those files once it grows past `journal_compact_after` records.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = count_lines(path) if os.path.exists(path) else 0
+        self.pending = 0
+        self.file = open(path, "a", encoding="utf-8")
+
+    def append(self, op: Literal["state", "delete", "edit"], key: str, **fields):
+        self.file.write(json.dumps({"op": op, "id": key, **fields}, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.records += 1
+        self.pending += 1
+        if self.pending >= journal_sync_every:
+            self.sync()
+
+    def sync(self):
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def needs_compaction(self) -> bool:
+        return self.records >= journal_compact_after
+
+    def truncate(self):
+        self.file.truncate(0)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records = 0
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+def count_lines(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+# Chapter numbers like 3.1 stay one token, literal ANSI escapes are no words
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)+|\w+")
+ESCAPE_PATTERN = re.compile(r"\\(?:033|x1b)\[[\d;]*m")
+
+def tokenize(text: str) -> set[str]:
+    return set(TOKEN_PATTERN.findall(ESCAPE_PATTERN.sub(" ", text).lower()))
+
+class SearchIndex:
+    """Inverted index from the words of question, answer and [chapter] tag to entries.
+
+    `tokens` is kept sorted, so the words starting with a prefix are one
+    bisect range. Entries are added and removed one at a time, so edits and
+    deletes update the index instead of rebuilding it.
+    """
+
+    def __init__(self, entries: Iterable[Entry] = ()):
+        self.postings = {}
+        self.tokens_by_entry = {}
+        for entry in entries:
+            self._add(entry)
+        self.tokens = sorted(self.postings)
+
+    def _add(self, entry: Entry) -> List[str]:
+        words = tokenize(f"{entry.question}\n{entry.answer}")
+        self.tokens_by_entry[entry] = words
+        new_words = []
+        for word in words:
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = set()
+                new_words.append(word)
+            posting.add(entry)
+        return new_words
+
+    def add(self, entry: Entry):
+        for word in self._add(entry):
+            bisect.insort(self.tokens, word)
+
+    def remove(self, entry: Entry):
+        for word in self.tokens_by_entry.pop(entry, ()):
+            posting = self.postings[word]
+            posting.discard(entry)
+            if not posting:
+                del self.postings[word]
+                del self.tokens[bisect.bisect_left(self.tokens, word)]
+
+    @profiled("select")
+    def search(self, query: str) -> set[Entry]:
+        """Entries containing every word of `query`, each word also matching as a prefix."""
+        term_matches = []
+        for term in TOKEN_PATTERN.findall(query.lower()):
+            i = bisect.bisect_left(self.tokens, term)
+            words = []
+            while i < len(self.tokens) and self.tokens[i].startswith(term):
+                words.append(self.tokens[i])
+                i += 1
+            if not words:
+                return set()
+            term_matches.append(set().union(*(self.postings[w] for w in words)) if len(words) > 1 else self.postings[words[0]])
+        if not term_matches:
+            return set()
+        # Intersect starting from the rarest term
+        term_matches.sort(key=len)
+        return term_matches[0].intersection(*term_matches[1:])
+
+BUCKETS = ("Important", "Unseen", "Not Known", "Known")
+
+def bucket_of(flags: int) -> str:
+    if not flags & SEEN:
+        return "Unseen"
+    if flags & IMPORTANT:
+        return "Important"
+    return "Known" if flags & KNOWN else "Not Known"
+
+# One translation table per bucket, mapping every flag byte to 1 if it belongs to the bucket
+BUCKET_TABLES = {
+    label: bytes(0 if flags & DELETED else int(bucket_of(flags) == label) for flags in range(256))
+    for label in BUCKETS
+}
+
+class Deck:
+    """All entries of the vocabulary, stored by ID, with their progress in parallel arrays.
+
+    Entries live in `slots` and are found through `slot_by_id`. The progress
+    of the entry in slot n is the flag byte `flags[n]` (KNOWN | SEEN |
+    IMPORTANT) and `schedules[n]`, so entries themselves only hold text.
+    Deleting an entry leaves a tombstone (None, DELETED) in its slot, so
+    deletes and edits are O(1) no matter how large the deck is; `vacuum` drops
+    the tombstones. The slots of every bucket are kept in `members`, built
+    from the flag bytes on the first bucket selection and updated on every
+    flag change from then on, so selecting a bucket costs about its size.
+    State changes go through `mark`, which also writes the journal.
+    """
+
+    def __init__(self, journal: Journal | None = None):
+        self.journal = journal
+        self.index = None
+        self.partial = False  # only some chapters loaded, never rewrite the files from it
+        self.slots = []
+        self.slot_by_id = {}
+        self.flags = bytearray()
+        self.schedules = []
+        self.members = None  # bucket -> set of slots, built by `bucket` on first use
+
+    def __len__(self) -> int:
+        return len(self.slot_by_id)
+
+    def __iter__(self) -> Iterator[Entry]:
+        return (e for e in self.slots if e is not None)
+
+    def get(self, key: str) -> Entry | None:
+        slot = self.slot_by_id.get(key)
+        return None if slot is None else self.slots[slot]
+
+    def add(self, entry: Entry, state: str = "") -> bool:
+        """Add `entry` with its progress record, unless an entry with the same question exists already."""
+        key = entry.id
+        if key in self.slot_by_id:
+            return False
+        flags, schedule = decode_state(state)
+        slot = len(self.slots)
+        self.slot_by_id[key] = slot
+        self.slots.append(entry)
+        self.flags.append(flags)
+        self.schedules.append(schedule)
+        if self.members is not None:
+            self.members[bucket_of(flags)].add(slot)
+        if self.index:
+            self.index.add(entry)
+        return True
+
+    def share(self) -> "Deck":
+        """A deck with the same entries and its own, empty progress, for another learner of the same vocabulary.
+
+        Both decks use the same `slots` and `slot_by_id`, so only marks may
+        be made on the shared one; deletes and edits would change both.
+        """
+        deck = Deck()
+        deck.slots = self.slots
+        deck.slot_by_id = self.slot_by_id
+        deck.flags = bytearray(flags & DELETED for flags in self.flags)
+        deck.schedules = [None] * len(self.slots)
+        return deck
+
+    def search_index(self) -> SearchIndex:
+        """The full-text index, built on first use and kept up to date from then on."""
+        if self.index is None:
+            self.index = SearchIndex(self)
+        return self.index
+
+    def flags_of(self, entry: Entry) -> int:
+        return self.flags[self.slot_by_id[entry.id]]
+
+    def schedule(self, entry: Entry) -> Schedule | None:
+        return self.schedules[self.slot_by_id[entry.id]]
+
+    def set_schedule(self, entry: Entry, schedule: Schedule):
+        self.schedules[self.slot_by_id[entry.id]] = schedule
+
+    def state(self, entry: Entry) -> str:
+        """The progress record of `entry`, as stored in progress.txt."""
+        slot = self.slot_by_id[entry.id]
+        return encode_state(self.flags[slot], self.schedules[slot])
+
+    @profiled("select")
+    def bucket(self, label: str) -> List[Entry]:
+        """The entries of a bucket, in deck order."""
+        if self.members is None:
+            # One pass over the flag bytes per bucket, from then on `set_flags` keeps the sets up to date
+            self.members = {
+                bucket: set(itertools.compress(range(len(self.flags)), self.flags.translate(table)))
+                for bucket, table in BUCKET_TABLES.items()
+            }
+        slots = self.slots
+        return [slots[slot] for slot in sorted(self.members[label])]
+
+    def set_flags(self, slot: int, flags: int):
+        old = self.flags[slot]
+        self.flags[slot] = flags
+        if self.members is not None and old != flags:
+            if not old & DELETED:
+                self.members[bucket_of(old)].discard(slot)
+            if not flags & DELETED:
+                self.members[bucket_of(flags)].add(slot)
+
+    @profiled("mark")
+    def mark(self, entry: Entry, known: bool | None = None, seen: bool | None = None, important: bool | None = None):
+        slot = self.slot_by_id[entry.id]
+        flags = self.flags[slot]
+        for flag, value in ((KNOWN, known), (SEEN, seen), (IMPORTANT, important)):
+            if value is not None:
+                flags = flags | flag if value else flags & ~flag
+        self.set_flags(slot, flags)
+        if self.journal:
+            self.journal.append("state", entry.id, state=encode_state(flags, self.schedules[slot]))
+
+    def restore(self, entry: Entry, state: str):
+        """Set the state of `entry` from a progress record, without journaling it."""
+        slot = self.slot_by_id[entry.id]
+        flags, self.schedules[slot] = decode_state(state)
+        self.set_flags(slot, flags)
+
+    def delete(self, entry: Entry):
+        key = entry.id
+        slot = self.slot_by_id.pop(key)
+        self.slots[slot] = None
+        self.set_flags(slot, DELETED)
+        self.schedules[slot] = None
+        if self.index:
+            self.index.remove(entry)
+        if self.journal:
+            self.journal.append("delete", key)
+
+    def edit(self, entry: Entry, question: str, answer: str):
+        old_key = entry.id
+        new_key = entry_id(question)
+        if new_key != old_key and new_key in self.slot_by_id:
+            raise ValueError("❌ Another entry already has this question.")
+        self.slot_by_id[new_key] = self.slot_by_id.pop(old_key)
+        if self.index:
+            self.index.remove(entry)
+        entry.question = question
+        entry.answer = answer
+        if self.index:
+            self.index.add(entry)
+        if self.journal:
+            self.journal.append("edit", old_key, question=question, answer=answer)
+
+    def vacuum(self):
+        """Drop the tombstones left behind by deletes and renumber the slots."""
+        if len(self.slots) == len(self.slot_by_id):
+            return
+        # The search index keeps working, the entries themselves do not change
+        live = [slot for slot, entry in enumerate(self.slots) if entry is not None]
+        self.slots = [self.slots[slot] for slot in live]
+        self.flags = bytearray(self.flags[slot] for slot in live)
+        self.schedules = [self.schedules[slot] for slot in live]
+        self.slot_by_id = {entry.id: slot for slot, entry in enumerate(self.slots)}
+        self.members = None  # renumbered, rebuilt on the next selection
+
+def replay_journal(deck: Deck, path: str, ops: Tuple[str, ...] = ("state", "delete", "edit")) -> dict[str, str]:
+    """Apply the journal records of an earlier session to `deck`, skipping the operations not in `ops`.
+
+    Returns the IDs the skipped edits gave to entries, as old ID -> newest ID.
+    """
+    applied = 0
+    renamed = {}  # new ID -> entry, for the edits that are skipped
+    offset = 0
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, start=1):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete record")
+                record = json.loads(line)
+            except ValueError:
+                # A crash while writing can leave a torn last record behind,
+                # cut it off so new records are not appended to it
+                print(f"⚠️ Dropping unreadable journal record at line {line_no} and everything after it.")
+                f.close()
+                with open(path, "r+b") as torn:
+                    torn.truncate(offset)
+                break
+            offset += len(line)
+            entry = deck.get(record["id"])
+            if entry is None:
+                # Later records of an entry whose edit was skipped use its new ID
+                entry = renamed.get(record["id"])
+            if entry is None:
+                continue
+            if record["op"] not in ops:
+                if record["op"] == "edit":
+                    renamed[entry_id(record["question"])] = entry
+                continue
+            if record["op"] == "state":
+                deck.restore(entry, record["state"])
+            elif record["op"] == "delete":
+                deck.delete(entry)
+            elif record["op"] == "edit":
+                try:
+                    deck.edit(entry, record["question"], record["answer"])
+                except ValueError:
+                    print(f"⚠️ Skipped journal edit at line {line_no}: the new question already exists.")
+                    continue
+            else:
+                raise ValueError(f"❌ Format error in {path}: Unknown journal operation at line {line_no}: {record['op']}")
+            applied += 1
+    if applied:
+        print(f"✅ Restored {applied} changes from {path}")
+    return {entry.id: key for key, entry in renamed.items()}
+
+def compact(deck: Deck):
+    deck.journal.sync()
+    if deck.partial:
+        return  # the journal waits for the next session with the whole deck
+    deck.vacuum()
+    # Back up the vocabulary right before it is rewritten, a session that never compacts leaves it untouched
+    if os.path.exists(Entry.path_all):
+        create_vocab_backup()
+    save_vocab(deck)
+    deck.journal.truncate()
+
+class Scheduler:
+    """SM-2 style spaced repetition over a deck, with a heap as due-date index.
+
+    The heap holds (due, seq, entry) tuples. Rescheduling an entry pushes a new
+    tuple and leaves the old one behind; stale tuples (rescheduled or deleted
+    entries) are dropped once they reach the top. `next_due` and `grade` are
+    therefore O(log n) and a session only ever touches the due entries.
+    """
+
+    def __init__(self, deck: Deck):
+        self.deck = deck
+        self.counter = itertools.count()
+        self.heap = [(s.due if s else 0.0, next(self.counter), e) for e, s in zip(deck.slots, deck.schedules) if e is not None]
+        heapq.heapify(self.heap)
+
+    def _due(self, entry: Entry) -> float:
+        s = self.deck.schedule(entry)
+        return s.due if s else 0.0
+
+    def next_due(self, now: float | None = None) -> Entry | None:
+        now = time.time() if now is None else now
+        while self.heap:
+            due, _, entry = self.heap[0]
+            if self.deck.get(entry.id) is not entry or self._due(entry) != due:
+                heapq.heappop(self.heap)
+                continue
+            return entry if due <= now else None
+        return None
+
+    def iter_due(self) -> Iterator[Entry]:
+        while (entry := self.next_due()) is not None:
+            yield entry
+
+    def grade(self, entry: Entry, quality: int, now: float | None = None):
+        """Reschedule `entry` after a review, `quality` goes from 0 (blackout) to 5 (perfect)."""
+        now = time.time() if now is None else now
+        s = self.deck.schedule(entry) or Schedule()
+        if quality < 3:
+            s.reps = 0
+            s.interval = 0.0
+            s.due = now + srs_relearn_delay
+        else:
+            s.reps += 1
+            if s.reps == 1:
+                s.interval = 1.0
+            elif s.reps == 2:
+                s.interval = 6.0
+            else:
+                s.interval *= s.ease
+            s.due = now + s.interval * 86400
+        s.ease = max(1.3, s.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.deck.set_schedule(entry, s)
+        heapq.heappush(self.heap, (s.due, next(self.counter), entry))
+
+    def postpone(self, entry: Entry, now: float | None = None):
+        """Show `entry` again after the relearn delay, without grading it."""
+        now = time.time() if now is None else now
+        s = self.deck.schedule(entry) or Schedule()
+        s.due = now + srs_relearn_delay
+        self.deck.set_schedule(entry, s)
+        heapq.heappush(self.heap, (s.due, next(self.counter), entry))
+
+def lazy_shuffle(items: list) -> Iterator:
+    """Yield `items` in random order, doing the Fisher-Yates swaps on demand."""
+    import random
+    for i in range(len(items) - 1, -1, -1):
+        j = random.randint(0, i)
+        items[i], items[j] = items[j], items[i]
+        yield items[i]
+
+@profiled("header")
+def render_header(mode="Trainer", current=0, local_total=0, terminal_width=80, terminal_height=24, status="") -> str:
     offset_vertical = max(0, (terminal_height - 40) // 2)
-    print("\n" * offset_vertical)
     
     # ANSI Colors
     CYAN = "\033[36m"
@@ -191,20 +1238,35 @@ def print_header(mode="Trainer", current=0, local_total=0):
         mode = f"{BLUE}🆕 Unseen Vocabulary 🆕{RESET}"
     elif mode == "Important":
         mode = f"{YELLOW}⚠️  Important Vocabulary ⚠️{RESET}"
+    elif mode == "Due":
+        mode = f"{CYAN}🔁 Due Vocabulary 🔁{RESET}"
+    elif mode == "Search":
+        mode = f"{CYAN}🔍 Search Results 🔍{RESET}"
     
-    print_formated("=-" * (text_box_size // 2), style="BOLD", colour="CYAN")
-    print(f"{mode}".center(terminal_width))
-    print_formated("=-" * (text_box_size // 2), style="BOLD", colour="CYAN")
-    print(f"{CYAN}[q] = quit{RESET}".center(terminal_width))
-    print(f"{CYAN}[e] = edit current entry{RESET}".center(terminal_width))
-    print(f"{CYAN}[d] = delete this entry{RESET}".center(terminal_width))
-    print(f"{CYAN}[m] = change mode [ important / known / unknown / unseen ]{RESET}".center(terminal_width))
-    print_formated("=-" * (text_box_size // 2), style="BOLD", colour="CYAN")
-    print("\n\n")
-
+    divider = format_text("=-" * (text_box_size // 2), style="BOLD", colour="CYAN", terminal_width=terminal_width)
     target_pos = int(max(terminal_width/2 - text_box_size/2, 0))
-    print_formated(f"Current: {current}/{local_total}    Total: {vocab_total}", colour="CYAN", style="NORMAL", position="RIGHT")
-    print(" " * target_pos + f"{CYAN}[ENTER] -> show answer{RESET}\n")
+    counter = f"{current}/{local_total}" if local_total is not None else f"{current}"
+    lines = [
+        "\n" * offset_vertical,
+        divider,
+        f"{mode}".center(terminal_width),
+        divider,
+        f"{CYAN}[q] = quit{RESET}".center(terminal_width),
+        f"{CYAN}[e] = edit current entry{RESET}".center(terminal_width),
+        f"{CYAN}[d] = delete this entry{RESET}".center(terminal_width),
+        f"{CYAN}[s] = search and train the matching entries{RESET}".center(terminal_width),
+        f"{CYAN}[m] = change mode [ important / known / unknown / unseen ]{RESET}".center(terminal_width),
+        divider,
+        f"\n{status}\n" if status else "\n\n",
+        format_text(f"Current: {counter}    Total: {vocab_total}", colour="CYAN", style="NORMAL", position="RIGHT", terminal_width=terminal_width),
+        " " * target_pos + f"{CYAN}[ENTER] -> show answer{RESET}\n",
+    ]
+    return "\n".join(lines) + "\n"
+
+def prompt_for_search() -> str:
+    terminal_width = console.size().columns
+    print_formated("Search for words or word beginnings, e.g. 'normal 3.2':", style="NORMAL", colour="CYAN")
+    return read_key(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip()
 
 def prompt_for_file(msg: str) -> str:
     print(msg)
@@ -214,39 +1276,25 @@ def prompt_for_file(msg: str) -> str:
             return path
         print("Invalid path. Try again.\n")
  
-def save_vocab(entries: List[Entry]):
-    known = [e for e in entries if e.known and e.seen]
-    not_known = [e for e in entries if not e.known and e.seen]
-    important = [e for e in entries if e.important and e.seen]
-
-    path = Path(Entry.path_known)
-    with open(path, "w") as f:
-        for e in known:
-            f.write(f"{e.question}\n{e.answer}\n")
-
-    path = Path(Entry.path_not_known)
-    with open(path, "w") as f:
-        for e in not_known:  
-            f.write(f"{e.question}\n{e.answer}\n")
-
-    path = Path(Entry.path_important)
-    with open(path, "w") as f:
-        for e in important:
-            f.write(f"{e.question}\n{e.answer}\n")
-
-    path = Path(Entry.path_all)
-    with open(path, "w") as f:
-        for e in entries:
-            f.write(f"{e.question}\n{e.answer}\n")
+@profiled("save")
+def save_vocab(deck: Deck):
+    write_atomic(Entry.path_all, (f"{e.question}\n{e.answer}\n" for e in deck))
+    save_progress(deck, Entry.path_progress)
+
+def save_progress(deck: Deck, path: str):
+    write_atomic(path, (
+        f"{e.id} {encode_state(flags, schedule)}\n"
+        for e, flags, schedule in zip(deck.slots, deck.flags, deck.schedules) if e is not None
+    ))
 
 def multi_line_input() -> str:
-        terminal_width, _ = shutil.get_terminal_size()
+        terminal_width, _ = console.size()
         indent = " " * max(terminal_width // 2 - text_box_size // 2, 0)
         print_formated("Type '#' on a new line to finish.", colour="CYAN", style="NORMAL")
         new_question = ""
         while True:
             # Print the current input
-            user_input = input(indent)    
+            user_input = read_key(indent)    
             if user_input == "#":
                 break
             new_question += " " + user_input + "\n"
@@ -257,20 +1305,21 @@ def multi_line_input() -> str:
         new_question = re.sub(r'\n+', '\n', new_question) # Normalize line endings
         new_question = new_question.strip()  # Remove leading/trailing whitespace
         new_question = re.sub(r"#$", "", new_question)
-        print(new_question)
+        console.write(f"{new_question}\n")
         return new_question
 
-def entry_editor(entry: Entry) -> Entry:
+def entry_editor(deck: Deck, entry: Entry) -> Entry:
+    terminal_width = console.size().columns
 
     while True:
         print_formated("Do you want to edit this question? [y/n]", style="NORMAL", colour="CYAN")
-        edit_confirm = input(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip().lower()
+        edit_confirm = read_key(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip().lower()
         clear_line()
         clear_line()
 
         if edit_confirm == "n":
             print_formated("Exiting editor...", style="NORMAL", colour="CYAN")
-            time.sleep(1)
+            pause()
             return
         elif edit_confirm == "y":
             print_formated("Continuing to edit...", style="NORMAL", colour="CYAN")
@@ -297,31 +1346,36 @@ def entry_editor(entry: Entry) -> Entry:
                 print_formated("❌ Invalid format. Answer must start with 'A:'. Please try again.", style="NORMAL", colour="RED")
         
         # Validate input
-        print("\n\n")
+        console.write("\n\n\n")
         print_formated(f"New Question:", style="NORMAL", colour="CYAN")
         print_formated(f"{new_question}", style="NORMAL", colour="WHITE")
-        print("\n")
+        console.write("\n\n")
         print_formated(f"New Answer: ", style="NORMAL", colour="CYAN")
         print_formated(f"{new_answer}", style="NORMAL", colour="WHITE")
-        print("\n")
+        console.write("\n\n")
 
         while True:
             print_formated("Confirm update? [y/n]", style="NORMAL", colour="CYAN")
-            confirm = input(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip().lower()
+            confirm = read_key(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip().lower()
             clear_line()              
             if confirm == "y":
-                entry.question = new_question
-                entry.answer = new_answer
+                old_key = entry.id
+                try:
+                    deck.edit(entry, new_question, new_answer)
+                except ValueError as e:
+                    print_formated(str(e), style="NORMAL", colour="RED")
+                    break
+                render_cache.invalidate(old_key)
                 print_formated("✅ Entry updated successfully.", style="NORMAL", colour="CYAN")
                 return entry
             elif confirm == "n":
                 print_formated(" ❌ Update cancelled", style="NORMAL", colour="CYAN")
                 print_formated("Exit editor? [y/n]", style="NORMAL", colour="CYAN")
-                exit_confirm = input(" " * max(terminal_width // 2 - text_box_size //  2, 0)).strip().lower()
+                exit_confirm = read_key(" " * max(terminal_width // 2 - text_box_size //  2, 0)).strip().lower()
                 clear_line()                  
                 if exit_confirm == "y":
                     print_formated("Exiting editor...", style="NORMAL", colour="CYAN")
-                    time.sleep(1)
+                    pause()
                     return
                 elif exit_confirm == "n":
                     print_formated("Continuing to edit...", style="NORMAL", colour="CYAN")
@@ -329,9 +1383,9 @@ def entry_editor(entry: Entry) -> Entry:
                     
             else:
                 print_formated("❌ Invalid input.", style="NORMAL", colour="RED")
-                time.sleep(1)
+                pause()
 
-def run_trainer(all_vocab: List[Entry], label: Literal["Important", "Known", "Not Known", "Unseen"] = "Known") -> Tuple[List[Entry], str | None]:    
+def run_trainer(deck: Deck, label: Literal["Important", "Known", "Not Known", "Unseen", "Due", "Search"] = "Known", scheduler: Scheduler | None = None, query: str = "") -> Tuple[Deck, str | None]:    
     CYAN = "\033[36m"
     BLUE = "\033[38;5;117m"
     GREEN = "\033[38;5;151m"
@@ -339,259 +1393,688 @@ def run_trainer(all_vocab: List[Entry], label: Literal["Important", "Known", "No
     RESET = "\033[0m"
     
 
-    if label == "Known":
-        entries = [e for e in all_vocab if e.known and e.seen and not e.important]
-        if not entries:
-            print_formated("No known entries found.", style="NORMAL", colour="CYAN")
-            time.sleep(1)
-            return (all_vocab, None)
-    elif label == "Important":
-        entries = [e for e in all_vocab if e.important and e.seen]
+    if label == "Due":
+        if scheduler is None:
+            raise ValueError("The 'Due' mode needs a scheduler.")
+        # Pull the due entries one by one from the scheduler's heap
+        if scheduler.next_due() is None:
+            show_feedback(format_text("No due entries found.", style="NORMAL", colour="CYAN"))
+            return (deck, None)
+        cards = scheduler.iter_due()
+        total = None
+    elif label == "Search":
+        entries = list(deck.search_index().search(query))
         if not entries:
-            print_formated("No known entries found.", style="NORMAL", colour="CYAN")
-            time.sleep(1)
-            return (all_vocab, None)
-    elif label == "Not Known":
-        entries = [e for e in all_vocab if not e.known and e.seen and not e.important]
-        if not entries:
-            print_formated("No not known entries found.", style="NORMAL", colour="CYAN")
-            time.sleep(1)
-            return (all_vocab, None)
-    elif label == "Unseen":
-        entries = [e for e in all_vocab if not e.seen]
+            show_feedback(format_text(f"No entries found for '{query}'.", style="NORMAL", colour="CYAN"))
+            return (deck, None)
+        cards = Lookahead(lazy_shuffle(entries))
+        total = len(entries)
+    elif label in BUCKETS:
+        # Only copy the bucket itself, the shuffle happens lazily while training
+        entries = deck.bucket(label)
         if not entries:
-            print_formated("No unseen entries found.", style="NORMAL", colour="CYAN")
-            time.sleep(1)
-            return (all_vocab, None)
+            show_feedback(format_text(f"No {label.lower()} entries found.", style="NORMAL", colour="CYAN"))
+            return (deck, None)
+        cards = Lookahead(lazy_shuffle(entries))
+        total = len(entries)
     else:
         raise ValueError(f"Invalid label: {label}")
-        return (all_vocab, None)
     
     exit_code = None # "q" | "m" | None
-    i = 0
-    while i < len(entries):
-        entry = entries[i]
-        current = i + 1
-        total = len(entries)
+    current = 0
+    for entry in profiler.iterate("shuffle", cards):
+        current += 1
         
-        print_header(label, current, total)
-        print_formated(entry.question, colour="WHITE", style="BOLD")
-        terminal_width = shutil.get_terminal_size().columns
-        input(" " * max(terminal_width // 2 - text_box_size // 2, 0))
-        clear_line()      
-        print_formated(entry.answer, colour="WHITE", style="BOLD")
+        # Header, question and prompt go out as a single frame
+        terminal_width, terminal_height = console.size()
+        indent = " " * max(terminal_width // 2 - text_box_size // 2, 0)
+        write_frame(
+            CLEAR_SCREEN,
+            render_header(label, current, total, terminal_width, terminal_height, take_status()),
+            render_cache.get(entry, "question", terminal_width),
+            indent,
+        )
+        profiler.card_shown()
+        if prefetch_depth:
+            # Due cards are only known once the current one is graded
+            upcoming = cards.peek(prefetch_depth) if label != "Due" else []
+            prefetcher.request(
+                [(entry, "answer")] + [(e, role) for e in upcoming for role in ("question", "answer")],
+                terminal_width,
+            )
+        read_key()
+        write_frame(CLEAR_LINE, render_cache.get(entry, "answer", terminal_width))
 
         while True:
-            terminal_width = shutil.get_terminal_size().columns
-            print_formated("Not known? [ENTER]     Known? [#]     Mark 'Important' [i]", style="NORMAL", colour="CYAN")
-            cmd = input(" " * max(terminal_width // 2 - text_box_size // 2, 0))
+            terminal_width = console.size().columns
+            indent = " " * max(terminal_width // 2 - text_box_size // 2, 0)
+            write_frame(
+                format_text("Not known? [ENTER]     Known? [#]     Mark 'Important' [i]", style="NORMAL", colour="CYAN", terminal_width=terminal_width),
+                "\n",
+                indent,
+            )
+            cmd = read_key()
             clear_line()    
             clear_line()      
 
             if cmd == "":
-                entry.known = False
-                entry.seen = True
-                print(f"❌ {CYAN}Marked as not known{RESET}".center(terminal_width))
-                time.sleep(0.75)
+                if scheduler:
+                    scheduler.grade(entry, quality=1)
+                deck.mark(entry, known=False, seen=True)
+                show_feedback(f"❌ {CYAN}Marked as not known{RESET}".center(terminal_width))
                 break
             elif cmd == "#":
-                entry.known = True
-                entry.seen = True
-                print(f"✅ {CYAN}Marked as known.{RESET}".center(terminal_width))
-                time.sleep(0.75)
+                if scheduler:
+                    scheduler.grade(entry, quality=4)
+                deck.mark(entry, known=True, seen=True)
+                show_feedback(f"✅ {CYAN}Marked as known.{RESET}".center(terminal_width))
                 break
             elif cmd == "q":
                 exit_code = "q"
-                return all_vocab, exit_code
+                return deck, exit_code
             elif cmd == "i":
-                if not entry.important: 
-                    entry.known = False
-                    entry.seen = True
-                    entry.important = True
-                    print(f"✅ {CYAN}Marked as important.{RESET}".center(terminal_width))
-                    time.sleep(0.75)
-                elif entry.important:
-                    entry.important = False
-                    print(f"❌ {CYAN}Unmarked as important.{RESET}".center(terminal_width))
-                    time.sleep(0.75)
+                if not deck.flags_of(entry) & IMPORTANT:
+                    if scheduler:
+                        scheduler.grade(entry, quality=1)
+                    deck.mark(entry, known=False, seen=True, important=True)
+                    show_feedback(f"✅ {CYAN}Marked as important.{RESET}".center(terminal_width))
+                else:
+                    if scheduler:
+                        scheduler.postpone(entry)
+                    deck.mark(entry, important=False)
+                    show_feedback(f"❌ {CYAN}Unmarked as important.{RESET}".center(terminal_width))
                 break
             elif cmd == "m":
                 exit_code = "m"
-                return all_vocab, exit_code
+                return deck, exit_code
+            elif cmd == "s":
+                exit_code = "s"
+                return deck, exit_code
             elif cmd == "e":
-                entry_editor(entry)
+                entry_editor(deck, entry)
                 continue  # Stay on current entry
             elif cmd == "d":
                 while True:
                     print_formated("Are you sure you want to delete this entry? [y/n]", style="NORMAL", colour="CYAN")
-                    confirm = input(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip().lower()
+                    confirm = read_key(" " * max(terminal_width // 2 - text_box_size // 2, 0)).strip().lower()
                     clear_line()                  
                     if confirm == "y":
-                        if entry in entries:
-                            entries.remove(entry)
-                        if entry in all_vocab:
-                            all_vocab.remove(entry)
-                        print_formated("✅ Entry deleted successfully.", style="NORMAL", colour="CYAN")
-                        time.sleep(0.75)
-                        i -= 1  # offset next increment to skip forward
+                        render_cache.invalidate(entry.id)
+                        deck.delete(entry)
+                        show_feedback(format_text("✅ Entry deleted successfully.", style="NORMAL", colour="CYAN"))
+                        current -= 1  # the deleted entry no longer counts
+                        if total is not None:
+                            total -= 1
                         break
                     elif confirm == "n":
-                        print_formated("❌ Deletion cancelled.", style="NORMAL", colour="RED")
-                        time.sleep(0.75)
+                        show_feedback(format_text("❌ Deletion cancelled.", style="NORMAL", colour="RED"))
                         break
                 break
-            
 
-        i += 1  # advance to next entry
+        # A long round must not let the journal grow without bound. The round holds
+        # entries, not slots, so it survives the renumbering of the compaction
+        if deck.journal and not deck.partial and deck.journal.needs_compaction():
+            compact(deck)
+
                
-    result = (all_vocab, exit_code)
+    result = (deck, exit_code)
     return result
 
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def read_backup_log() -> List[Tuple[float, str, int, int]]:
+    """Backups as (time, content hash, file size, file mtime) records, oldest first."""
+    from pathlib import Path
+    path = Path(Entry.path_backup) / "backups.txt"
+    if not path.exists():
+        return []
+    log = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            created, digest, size, mtime = line.split()
+            log.append((float(created), digest, int(size), int(mtime)))
+    return log
+
+def prune_backups(log: List[Tuple[float, str, int, int]]) -> List[Tuple[float, str, int, int]]:
+    """Keep the `backup_keep_latest` newest backups, and of the older ones the newest of each recent hour, day and week."""
+    from pathlib import Path
+    keep = set(range(max(len(log) - backup_keep_latest, 0), len(log)))
+    for period, count in backup_retention:
+        periods = set()
+        for i in range(len(log) - 1, -1, -1):
+            bucket = int(log[i][0] // period)
+            if bucket not in periods and len(periods) < count:
+                periods.add(bucket)
+                keep.add(i)
+    kept = [record for i, record in enumerate(log) if i in keep]
+
+    # Snapshots are shared by all records with the same content
+    used = {record[1] for record in kept}
+    for record in log:
+        if record[1] not in used:
+            Path(Entry.path_backup, f"{record[1]}.txt.gz").unlink(missing_ok=True)
+            used.add(record[1])
+    return kept
+
 def create_vocab_backup():
-    backup_path = Path(Entry.path_backup) / f"vocabulary_backup_{time.strftime('%d.%m.%Y-%H:%M:%S')}.txt"
-    if os.path.exists(backup_path):
-        i = 2 
-        while True:
-            backup_path = Path(Entry.path_backup) / f"vocabulary_backup_{time.strftime('%d.%m.%Y-%H:%M:%S')}_{i}.txt"
-            if os.path.exists(backup_path):
-                i += 1
-            else:
-                print(f"❌ Backup file already exists. Creating new backup at {backup_path.stem}")
-                break
-    os.makedirs(backup_path.parent, exist_ok=True)
-    shutil.copy(Entry.path_all, backup_path)
-    print(f"✅ Backup created at {backup_path.stem}")
+    """Snapshot vocabulary.txt into the backup folder, unless it did not change.
+
+    Snapshots are gzip files named after the hash of their content, so equal
+    content is only stored once. An unchanged size and mtime skips even the
+    hashing.
+    """
+    import gzip
+    import shutil
+    from pathlib import Path
+    backup_dir = Path(Entry.path_backup)
+    log = read_backup_log()
+    stat = os.stat(Entry.path_all)
+    if log and log[-1][2:] == (stat.st_size, stat.st_mtime_ns):
+        print(f"✅ Vocabulary unchanged since backup {log[-1][1]}")
+        return
+
+    digest = file_digest(Entry.path_all)
+    snapshot = backup_dir / f"{digest}.txt.gz"
+    if snapshot.exists():
+        print(f"✅ Vocabulary unchanged since backup {digest}")
+    else:
+        os.makedirs(backup_dir, exist_ok=True)
+        tmp_path = f"{snapshot}.tmp"
+        with open(Entry.path_all, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, snapshot)
+        print(f"✅ Backup created at {digest}")
+
+    log.append((time.time(), digest, stat.st_size, stat.st_mtime_ns))
+    log = prune_backups(log)
+    write_atomic(backup_dir / "backups.txt", (f"{created} {d} {size} {mtime}\n" for created, d, size, mtime in log))
+
+def restore_vocab_backup(selector: str):
+    """Restore the backup whose hash starts with `selector`, or list the backups."""
+    import gzip
+    import shutil
+    from pathlib import Path
+    log = read_backup_log()
+    if not selector:
+        for created, digest, size, _ in reversed(log):
+            print(f"{digest}  {time.strftime('%d.%m.%Y-%H:%M:%S', time.localtime(created))}  {size} bytes")
+        if not log:
+            print("No backups found.")
+        return
+
+    matches = {digest for _, digest, _, _ in log if digest.startswith(selector)}
+    if len(matches) != 1:
+        raise ValueError(f"❌ {'No' if not matches else 'More than one'} backup matches '{selector}'.")
+    digest = matches.pop()
+
+    # Fold the journal into the files first, its edits and deletes belong to the current deck
+    if os.path.exists(Entry.path_all):
+        try:
+            deck = load_deck(Entry.path_all)
+        except ValueError as e:
+            print(e)
+            print("⚠️ Restoring without folding the journal into the broken vocabulary file.")
+        else:
+            deck.journal = Journal(Entry.path_journal)
+            compact(deck)
+            deck.journal.close()
+        create_vocab_backup()
+
+    tmp_path = f"{Entry.path_all}.tmp"
+    with gzip.open(Path(Entry.path_backup) / f"{digest}.txt.gz", "rb") as src, open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, Entry.path_all)
+    print(f"✅ Restored backup {digest}")
+
+CONFLICT_POLICIES = ("first", "last", "longest")
+
+def parse_deck_file(path: str) -> Tuple[List[Tuple[str, str, str]], str | None]:
+    """Parse one deck file for `import_decks`, usually in a worker process.
+
+    Returns a (normalized question, question, answer) triple per entry, or
+    the error that stopped the parser.
+    """
+    try:
+        return [(normalize_question(e.question), e.question, e.answer) for e in iter_vocab_file(path)], None
+    except (OSError, ValueError) as e:
+        return [], str(e)
+
+def collect_deck_files(paths: List[str]) -> List[str]:
+    """The given files plus every .txt file below the given directories, each once and in a fixed order."""
+    from pathlib import Path
+    files = []
+    seen = set()
+    for path in paths:
+        found = sorted(str(p) for p in Path(path).rglob("*.txt")) if os.path.isdir(path) else [path]
+        for file in found:
+            if os.path.realpath(file) not in seen:
+                seen.add(os.path.realpath(file))
+                files.append(file)
+    return files
+
+def import_decks(paths: List[str], output: str, policy: str = "first", workers: int | None = None):
+    """Merge many deck files into `output`, parsing them in parallel.
+
+    Entries are merged by their normalized question, like duplicates are
+    dropped when loading. `output` itself comes first if it exists, the
+    other files follow in the order given (directories sorted by path), so
+    the result never depends on which worker finishes first. The first
+    question text always wins, so the progress of existing entries is kept.
+    For a different answer, `policy` keeps the 'first' one, the 'last' one
+    or the 'longest' one.
+    """
+    files = collect_deck_files(paths)
+    existing = None
+    if os.path.exists(output):
+        files = [f for f in files if os.path.realpath(f) != os.path.realpath(output)]
+        # Only the imported decks may be skipped, a broken output would be replaced by them without its entries
+        existing = [(normalize_question(e.question), e.question, e.answer) for e in iter_vocab_file(output)]
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    if workers > 1 and len(files) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            # map keeps the order of `files`, whatever order the workers finish in
+            results = list(pool.map(parse_deck_file, files, chunksize=max(1, len(files) // (workers * 4))))
+    else:
+        results = [parse_deck_file(f) for f in files]
+    if existing is not None:
+        files = [output] + files
+        results = [(existing, None)] + results
+
+    merged = {}  # normalized question -> [question, answer], in the order they were first seen
+    read = conflicts = 0
+    for path, (entries, error) in zip(files, results):
+        if error:
+            print(f"⚠️ Skipped {path}: {error}")
+            continue
+        for key, question, answer in entries:
+            read += 1
+            current = merged.get(key)
+            if current is None:
+                merged[key] = [question, answer]
+            elif current[1] != answer:
+                conflicts += 1
+                if policy == "last" or (policy == "longest" and len(answer) > len(current[1])):
+                    current[1] = answer
+
+    if os.path.realpath(output) == os.path.realpath(Entry.path_all) and os.path.exists(output):
+        create_vocab_backup()
+    write_atomic(output, (f"{question}\n{answer}\n" for question, answer in merged.values()))
+    elapsed = time.perf_counter() - start
+    processes = min(workers, len(files)) if len(files) > 1 else 1
+    print(f"✅ Merged {read} entries from {len(files)} files into {len(merged)} entries in {output} "
+          f"({read / elapsed:,.0f} entries/s, {processes} process{'es' if processes != 1 else ''})")
+    if read > len(merged):
+        print(f"   {read - len(merged)} duplicates dropped, {conflicts} with a different answer (kept the {policy} one)")
+
+SNAPSHOT_VERSION = 1
+
+def snapshot_sources(path: str) -> List[str]:
+    """The files a deck loaded from `path` is built from."""
+    if os.path.exists(Entry.path_progress):
+        return [path, Entry.path_progress]
+    return [path, Entry.path_known, Entry.path_not_known, Entry.path_important]
+
+def source_signature(path: str) -> List | None:
+    """[size, mtime, content hash] of `path`, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, file_digest(path)]
+
+def save_snapshot(deck: Deck, path: str):
+    """Store the parsed, deduplicated and reconciled `deck` for the next start."""
+    mapped = bool(deck.slots) and isinstance(deck.slots[0], MappedEntry)
+    snapshot = {
+        "version": [SNAPSHOT_VERSION, *sys.version_info[:2]],
+        "sources": [[source, source_signature(source)] for source in snapshot_sources(path)],
+        "mapped": mapped,
+        "ids": [e.id for e in deck.slots],
+        "flags": bytes(deck.flags),
+        "schedules": [s and (s.ease, s.interval, s.reps, s.due) for s in deck.schedules],
+    }
+    if mapped:
+        snapshot["offsets"] = [e.offset for e in deck.slots]
+        snapshot["lengths"] = [e.length for e in deck.slots]
+    else:
+        snapshot["questions"] = [e.question for e in deck.slots]
+        snapshot["answers"] = [e.answer for e in deck.slots]
+    tmp_path = f"{Entry.path_snapshot}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(marshal.dumps(snapshot))
+    os.replace(tmp_path, Entry.path_snapshot)
+
+def load_snapshot(path: str) -> Deck | None:
+    """The deck stored by `save_snapshot`, or None if it is missing or any of its sources changed.
+
+    Sources with the same size and mtime count as unchanged, without reading
+    them; a changed mtime alone only costs a hash of the file.
+    """
+    try:
+        with open(Entry.path_snapshot, "rb") as f:
+            snapshot = marshal.loads(f.read())  # much faster than marshal.load(f), which reads piece by piece
+        if snapshot["version"] != [SNAPSHOT_VERSION, *sys.version_info[:2]]:
+            return None
+        sources = snapshot["sources"]
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        return None
+
+    if [source for source, _ in sources] != snapshot_sources(path):
+        return None
+    touched = False
+    for source, signature in sources:
+        if signature is None:
+            if os.path.exists(source):
+                return None
+            continue
+        try:
+            stat = os.stat(source)
+        except FileNotFoundError:
+            return None
+        if [stat.st_size, stat.st_mtime_ns] != signature[:2]:
+            if stat.st_size != signature[0] or file_digest(source) != signature[2]:
+                return None
+            touched = True
+    if snapshot["mapped"] != (os.path.getsize(path) >= mmap_min_size):
+        return None
+
+    deck = Deck()
+    ids = snapshot["ids"]
+    if snapshot["mapped"]:
+        source = map_file(path)
+        deck.slots = list(map(MappedEntry, itertools.repeat(source), snapshot["offsets"], snapshot["lengths"], ids))
+    else:
+        deck.slots = list(map(Entry, snapshot["questions"], snapshot["answers"]))
+    deck.slot_by_id = dict(zip(ids, range(len(ids))))
+    deck.flags = bytearray(snapshot["flags"])
+    deck.schedules = [s and Schedule(*s) for s in snapshot["schedules"]]
+    if touched:
+        save_snapshot(deck, path)  # store the new mtimes, so the next start skips the hashing
+    print(f"✅ Loaded {len(deck)} entries from {Entry.path_snapshot}")
+    return deck
+
+@profiled("reconcile")
+def load_deck(path: str, chapters: List[str] | None = None) -> Deck:
+    """Load the vocabulary at `path` with its progress and the changes still in the journal.
+
+    With `chapters`, only the entries of the matching chapters are parsed,
+    using the byte ranges of the chapter index. Files of at least
+    `mmap_min_size` bytes are memory-mapped and their entries keep only the
+    position of their text. A whole deck comes from the snapshot of the last
+    start if none of its files changed since.
+    """
+    deck = None if chapters else load_snapshot(path)
+    if deck is None:
+        deck = parse_deck(path, chapters)
+        if not deck.partial:
+            save_snapshot(deck, path)
+
+    # Restore the changes of earlier sessions that were not compacted yet
+    if os.path.exists(Entry.path_journal):
+        replay_journal(deck, Entry.path_journal)
+    return deck
+
+def parse_deck(path: str, chapters: List[str] | None = None, progress: dict[str, str] | None = None) -> Deck:
+    # Load progress, unless given, falling back to the old known/not_known/important files once
+    if progress is None and os.path.exists(Entry.path_progress):
+        progress = load_progress(Entry.path_progress)
+    elif progress is None:
+        progress = migrate_legacy_progress()
+
+    deck = Deck()
+    if chapters:
+        index = load_chapter_index(path)
+        selected = select_chapters(index, chapters)
+        if not selected:
+            raise ValueError(f"❌ No chapter matches {', '.join(chapters)}.")
+        print(f"✅ Loading {len(selected)} of {len(index)} chapters")
+        # Parse in file order, so the deck keeps the order of the file
+        blocks = iter_vocab_ranges(path, sorted(run[:3] for c in selected for run in index[c]))
+        deck.partial = True
+    else:
+        blocks = iter_vocab_blocks(path)
+    source = map_file(path) if os.path.getsize(path) >= mmap_min_size else None
 
+    # Drop duplicates based on the normalized question text while streaming
+    seen_questions = set()
+    counter = 0
+    for entry, offset, length, _ in profiler.iterate("load", blocks):
+        counter += 1
+        key = normalize_question(entry.question)
+        if key in seen_questions:
+            continue
+        seen_questions.add(key)
+        if source is not None:
+            entry = MappedEntry(source, offset, length, entry.id)
+        deck.add(entry, progress.get(entry.id, ""))
+    del seen_questions
+    print("✅ Format validated successfully.")
+    counter = counter - len(deck)
+    if counter:
+        print(f"⚠️ Dropped {counter} duplicate entries based on question text.")
+    return deck
+
+def load_deck_quietly(path: str) -> Deck:
+    """`load_deck` for the subcommands, with its status messages on stderr so stdout stays machine readable."""
+    with contextlib.redirect_stdout(sys.stderr):
+        return load_deck(path)
+
+def deck_stats(deck: Deck, now: float | None = None) -> dict:
+    """Number of entries, entries per bucket and cards due for spaced repetition."""
+    now = time.time() if now is None else now
+    return {
+        "entries": len(deck),
+        "buckets": {label: len(deck.bucket(label)) for label in BUCKETS},
+        "due": sum(1 for e, s in zip(deck.slots, deck.schedules) if e is not None and (s is None or s.due <= now)),
+    }
 
+def command_stats(args: argparse.Namespace) -> int:
+    """Print the size of every bucket, the due cards and the journal records not compacted yet."""
+    if not os.path.exists(Entry.path_all):
+        print(f"❌ No vocabulary at {Entry.path_all}", file=sys.stderr)
+        return 1
+    deck = load_deck_quietly(Entry.path_all)
+    stats = deck_stats(deck)
+    stats["chapters"] = len({chapter_of(e.question) for e in deck})
+    stats["journal"] = count_lines(Entry.path_journal) if os.path.exists(Entry.path_journal) else 0
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return 0
+    print(f"{'Entries':<12}{stats['entries']:>8}")
+    for label, count in stats["buckets"].items():
+        print(f"  {label:<10}{count:>8}")
+    print(f"{'Due now':<12}{stats['due']:>8}")
+    print(f"{'Chapters':<12}{stats['chapters']:>8}")
+    print(f"{'Journal':<12}{stats['journal']:>8}  records not compacted yet")
+    return 0
+
+def command_validate(args: argparse.Namespace) -> int:
+    """Parse the vocabulary files, report format errors and duplicate questions; exit code 1 on errors."""
+    failed = 0
+    for path in args.paths or [Entry.path_all]:
+        seen_questions = set()
+        count = duplicates = 0
+        try:
+            for entry in iter_vocab_file(path):
+                count += 1
+                key = normalize_question(entry.question)
+                if key in seen_questions:
+                    duplicates += 1
+                seen_questions.add(key)
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(e if isinstance(e, ValueError) else f"❌ Cannot read {path}: {e.strerror}", file=sys.stderr)
+            continue
+        print(f"✅ {path}: {count} entries" + (f", {duplicates} duplicate questions" if duplicates else ""))
+    return 1 if failed else 0
+
+def command_export(args: argparse.Namespace) -> int:
+    """Write the deck with its progress as a vocabulary file, JSON or CSV."""
+    if not os.path.exists(Entry.path_all):
+        print(f"❌ No vocabulary at {Entry.path_all}", file=sys.stderr)
+        return 1
+    deck = load_deck_quietly(Entry.path_all)
+    entries = deck.bucket(args.bucket) if args.bucket else list(deck)
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "txt":
+            out.writelines(f"{e.question}\n{e.answer}\n" for e in entries)
+        elif args.format == "json":
+            records = [{"question": e.question, "answer": e.answer, "bucket": bucket_of(deck.flags_of(e)), "state": deck.state(e)}
+                       for e in entries]
+            json.dump(records, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            import csv
+            writer = csv.writer(out)
+            writer.writerow(("question", "answer", "bucket", "state"))
+            writer.writerows((e.question, e.answer, bucket_of(deck.flags_of(e)), deck.state(e)) for e in entries)
+    finally:
+        if args.output:
+            out.close()
+    if args.output:
+        print(f"✅ Exported {len(entries)} entries to {args.output}", file=sys.stderr)
+    return 0
+
+# Non-interactive subcommands, they never clear the screen or wait for a key
+COMMANDS = {"stats": command_stats, "validate": command_validate, "export": command_export}
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Terminal vocabulary trainer.")
+    parser.add_argument("--srs", action="store_true", help="only review the cards that are due (spaced repetition)")
+    parser.add_argument("--chapter", action="append", metavar="CHAPTER",
+                        help="only load the chapters starting with CHAPTER, e.g. '3' or '3.1' (can be repeated)")
+    parser.add_argument("--chapters", action="store_true", help="list the chapters and their number of entries and exit")
+    parser.add_argument("--search", metavar="QUERY", help="start with the entries matching QUERY (words or word beginnings)")
+    parser.add_argument("--duplicates", action="store_true", help="list clusters of near duplicate questions and exit")
+    parser.add_argument("--restore", nargs="?", const="", metavar="BACKUP",
+                        help="restore the backup whose hash starts with BACKUP, or list the backups if none is given")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="time the phases of the session and write a JSON report to PATH, or cProfile statistics if PATH ends in .prof")
+    parser.add_argument("--import", dest="import_paths", nargs="+", metavar="PATH",
+                        help="merge these deck files and directories of .txt decks into the vocabulary and exit")
+    parser.add_argument("--output", metavar="PATH", help="write the merged decks of --import here instead of the vocabulary")
+    parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES, default="first",
+                        help="answer to keep when --import finds a question twice (default: %(default)s)")
+    parser.add_argument("--workers", type=int, metavar="N", help="processes that parse the decks of --import (default: one per core)")
+    parser.add_argument("--user", metavar="NAME",
+                        help=f"keep the progress of NAME in {Entry.path_users}/NAME, the vocabulary stays shared")
+    parser.add_argument("--pace", type=float, default=feedback_delay, metavar="SECONDS",
+                        help="hold confirmations this long before the next card (default: %(default)s, keep them in the next frame instead)")
+
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", title="commands (run without a terminal and exit)")
+    stats = commands.add_parser("stats", help="print the bucket sizes, due cards and pending journal records")
+    stats.add_argument("--json", action="store_true", help="print the numbers as JSON")
+    validate = commands.add_parser("validate", help="check the format of vocabulary files, exit code 1 on errors")
+    validate.add_argument("paths", nargs="*", metavar="PATH", help=f"files to check (default: {Entry.path_all})")
+    export = commands.add_parser("export", help="write the deck with its progress as txt, JSON or CSV")
+    export.add_argument("--format", choices=("txt", "json", "csv"), default="json", help="output format (default: %(default)s)")
+    export.add_argument("--bucket", choices=BUCKETS, help="only export the entries of this bucket")
+    export.add_argument("-o", "--output", metavar="PATH", help="write to PATH instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None):
+    args = parse_args(argv)
+    if not args.profile:
+        return run(args)
+    profiler.enable(cprofile=args.profile.endswith(".prof"))
+    try:
+        return run(args)
+    finally:
+        profiler.write_report(args.profile)
+
+def run(args: argparse.Namespace):
+    global feedback_delay
+    feedback_delay = args.pace
+
+    if args.user:
+        select_user(args.user)
+
+    if args.restore is not None:
+        restore_vocab_backup(args.restore)
+        return
+
+    if args.import_paths:
+        import_decks(args.import_paths, args.output or Entry.path_all, args.on_conflict, args.workers)
+        return
+
+    if args.command:
+        return COMMANDS[args.command](args)
 
-def main():
     clear()
 
-    # Create backup of vocabulary file
-    if os.path.exists(Entry.path_all):
-        create_vocab_backup()
-
-    # Create known and not known files if they don't exist
-    if not os.path.exists(Entry.path_known):
-        with open(Entry.path_known, "w") as f:
-            f.write("")
-    if not os.path.exists(Entry.path_not_known):
-        with open(Entry.path_not_known, "w") as f:
-            f.write("")
-    if not os.path.exists(Entry.path_important):
-        with open(Entry.path_important, "w") as f:
-            f.write("")
-
-    # Load vocab
+    # Load vocab (the parser validates the format while reading)
     all_path = Entry.path_all if os.path.exists(Entry.path_all) else prompt_for_file("No 'vocabulary.txt' found.")
-    all_vocab = load_vocab_file(all_path)
     print(all_path)
-    validate_format(all_vocab)
 
-    global vocab_total
-    vocab_total = len(all_vocab)
+    if args.chapters:
+        print_chapters(all_path)
+        return
 
-    # Drop duplicates based on `id`
-    seen_questions = set()
-    unique_entries = []
-    counter = 0
-    for entry in all_vocab:
-        if entry.question not in seen_questions:
-            seen_questions.add(entry.question)
-            unique_entries.append(entry)
-            counter += 1
-    all_vocab = unique_entries
-    counter = vocab_total - counter
-    if counter:
-        print(f"⚠️ Dropped {counter} duplicate entries based on question text.")
+    deck = load_deck(all_path, args.chapter)
 
-    vocab_total = len(all_vocab)
+    if args.duplicates:
+        print_near_duplicates(list(deck))
+        return
 
-    known = []
-    not_known = []
+    deck.journal = Journal(Entry.path_journal)
 
-    # Initialize sets
-    known_question_set = set()
-    not_known_question_set = set()
-    important_question_set = set()
+    global vocab_total
+    vocab_total = len(deck)
 
-    # Load known vocab
-    known_path = Path(Entry.path_known)
-    if os.path.exists(known_path):
-        known = load_vocab_file(known_path)
-        # Set all known entries known:True and seen:True
-        print(known_path)
-        validate_format(known)
-        known_question_set = {e.question for e in known}
-    
-    # Load not known vocab
-    not_known_path = Path(Entry.path_not_known)
-    if os.path.exists(not_known_path):
-        not_known = load_vocab_file(not_known_path)
-        # Set all not known entries known:False and seen:True
-        print(not_known_path)
-        validate_format(not_known)
-        not_known_question_set = {e.question for e in not_known}
-
-    # Load important vocab
-    important_path = Path(Entry.path_important)
-    if os.path.exists(important_path):
-        important = load_vocab_file(important_path)
-        # Set all not known entries known:False and seen:True
-        print(important_path)
-        validate_format(important)
-        important_question_set = {e.question for e in important}
-
-    # Set all entries in all_vocab that are not in known or not_known as unseen
-    # And set known:False and seen:True
-    for entry in all_vocab:
-        if entry.question in known_question_set:
-            entry.known = True
-            entry.seen = True
-        elif entry.question in not_known_question_set:
-            entry.known = False
-            entry.seen = True
-        else:
-            entry.known = False
-            entry.seen = False
-        if entry.question in important_question_set:
-            entry.important = True
+    # Spaced repetition replaces the bucket rounds when started with --srs
+    scheduler = Scheduler(deck) if args.srs else None
 
+    query = args.search
     while True:
-        # Important first
-        # Shuffle not known entries
-        random.shuffle(all_vocab)
-        all_vocab, exit_code = run_trainer(all_vocab, label="Important")
-        if exit_code == "q":
-            break
-        # Unseen entries 
-        # Shuffle unseen entries
-        random.shuffle(all_vocab)
-        all_vocab, exit_code = run_trainer(all_vocab, label="Unseen")
-        if exit_code == "q":
-            break
-        # Not known first
-        # Shuffle not known entries
-        random.shuffle(all_vocab)
-        all_vocab, exit_code = run_trainer(all_vocab, label="Not Known")
-        if exit_code == "q":
-            break
-        # Seen entries
-        # Shuffle seen entries
-        random.shuffle(all_vocab)
-        all_vocab, exit_code = run_trainer(all_vocab, label="Known")
+        # Fold the journal into the deck files every once in a while
+        if deck.journal.needs_compaction():
+            compact(deck)
+
+        if query is not None:
+            deck, exit_code = run_trainer(deck, label="Search", query=query)
+            query = None
+        elif scheduler:
+            deck, exit_code = run_trainer(deck, label="Due", scheduler=scheduler)
+            if exit_code == "m":
+                scheduler = None  # continue with the bucket rounds
+                continue
+            if exit_code != "s":
+                break
+        else:
+            # Important first, then unseen, not known and known entries
+            for label in BUCKETS:
+                deck, exit_code = run_trainer(deck, label=label)
+                if exit_code in ("q", "s"):
+                    break
+            if not len(deck):
+                # Every bucket is empty, another round would only show the same messages again
+                break
+
         if exit_code == "q":
             break
+        if exit_code == "s":
+            query = prompt_for_search()
 
-
-    save_vocab(all_vocab)
+    # Only rewrite the deck when the journal got long, otherwise it is replayed on the next start
+    if deck.journal.needs_compaction():
+        compact(deck)
+    deck.journal.close()
     print("\n\n")
     print_formated("=-" * (text_box_size // 2), style="BOLD", colour="CYAN")
     print_formated("🎉 Good Job! 🎉 Press Enter to exit...", style="NORMAL", colour="CYAN", position="CENTER")
     print_formated("=-" * (text_box_size // 2), style="BOLD", colour="CYAN")
     print("\n\n\n\n")
-    time.sleep(1)
+    pause()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src_and_data"))
+
+import vocabulary_trainer as vt
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory with a src_and_data folder, where the trainer keeps its files."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src_and_data").mkdir()
+    # select_user changes the paths of Entry, put them back after every test
+    for name in (*vt.USER_FILES, "path_users"):
+        monkeypatch.setattr(vt.Entry, name, getattr(vt.Entry, name))
+    return tmp_path
@@ -0,0 +1,89 @@
+import json
+
+import progress_server
+import vocabulary_trainer as vt
+from test_vocabulary_trainer import EDITED, ENTRIES, make_changes, start_session, write_vocab
+
+def card_id(number: int) -> str:
+    return vt.entry_id(f"Q: {ENTRIES[number][0]}")
+
+def start_server() -> progress_server.ProgressServer:
+    return progress_server.ProgressServer(vt.parse_deck(vt.Entry.path_all, progress={}))
+
+def answer(server, key, **fields):
+    status, payload = server.handle("POST", f"/users/alex/cards/{key}", json.dumps(fields).encode())
+    assert status == 200, payload
+    return payload["card"]
+
+def state(server, key) -> str:
+    return server.handle("GET", f"/users/alex/cards/{key}")[1]["card"]["state"]
+
+def test_server_appends_to_the_trainer_journal(workdir, monkeypatch):
+    write_vocab()
+    vt.select_user("alex")
+    deck = start_session()
+    make_changes(deck)
+    deck.journal.close()
+    with open(vt.Entry.path_journal, "rb") as f:
+        trainer_journal = f.read()
+
+    monkeypatch.setattr(vt, "journal_compact_after", 2)
+    server = start_server()
+    # The mark the trainer journaled after its edit reaches the unedited card of the shared deck
+    assert state(server, card_id(3)) == "ks"
+    answered = [card_id(number) for number in range(5, 10)]
+    for key in answered:
+        answer(server, key, known=True)
+    server.close()
+
+    # The server never truncates the journal, its marks follow the trainer's
+    with open(vt.Entry.path_journal, "rb") as f:
+        assert f.read().startswith(trainer_journal)
+
+    # The next trainer session gets its own edits and deletes back, and the answers given to the server
+    deck = vt.load_deck(vt.Entry.path_all)
+    assert deck.get(vt.entry_id(EDITED)) is not None
+    assert deck.get(card_id(2)) is None
+    for key in answered:
+        assert deck.state(deck.get(key)) == "ks"
+
+    # And a restarted server still has all of them
+    server = start_server()
+    for key in answered:
+        assert state(server, key) == "ks"
+    server.close()
+
+def test_newest_mark_wins_between_trainer_and_server(workdir):
+    write_vocab()
+    vt.select_user("alex")
+    deck = start_session()
+    make_changes(deck)
+    deck.mark(deck.get(card_id(5)), known=True, seen=True)
+    deck.journal.close()
+
+    # The server answers after the trainer session, also for the card the trainer edited
+    server = start_server()
+    assert state(server, card_id(5)) == "ks"
+    answer(server, card_id(5), known=False)
+    answer(server, card_id(3), known=False)
+    server.close()
+
+    deck = start_session()
+    assert deck.state(deck.get(card_id(5))) == "s"
+    assert deck.state(deck.get(vt.entry_id(EDITED))) == "s"
+    # Then the trainer answers again, and a restarted server sees that
+    deck.mark(deck.get(card_id(5)), known=True)
+    deck.journal.close()
+
+    server = start_server()
+    assert state(server, card_id(5)) == "ks"
+    assert state(server, card_id(3)) == "s"
+    server.close()
+
+    # A compaction by the trainer keeps the newest marks and the edit
+    deck = start_session()
+    vt.compact(deck)
+    deck.journal.close()
+    deck = vt.load_deck(vt.Entry.path_all)
+    assert deck.state(deck.get(card_id(5))) == "ks"
+    assert deck.state(deck.get(vt.entry_id(EDITED))) == "s"
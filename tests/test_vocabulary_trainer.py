@@ -0,0 +1,207 @@
+import os
+
+import pytest
+
+import vocabulary_trainer as vt
+from session_driver import ScriptedConsole
+
+CHAPTERS = ("1 Basics", "2 Tables", "2.1 Keys", "10 Indexes")
+ENTRIES = [(f"word {i} [{CHAPTERS[i % len(CHAPTERS)]}]", f"Wort {i}") for i in range(40)]
+# Copies of earlier questions in other chapters, which a full load drops, in a run of their chapter
+CROSS_CHAPTER = [("word 40 [1 Basics]", "Wort 40"), ("Word 5! [1 Basics]", "Wort 5"), ("word 41 [1 Basics]", "Wort 41")]
+EDITED = "Q: word three, edited [10 Indexes]"  # the new question of entry 3, in the same chapter
+
+def write_vocab(entries=ENTRIES, newline="\n"):
+    with open(vt.Entry.path_all, "w", encoding="utf-8", newline=newline) as f:
+        f.writelines(f"Q: {question}\nA: {answer}\n" for question, answer in entries)
+
+def start_session(chapters=None) -> vt.Deck:
+    """Load the deck like the trainer does, with a journal for the changes of this session."""
+    deck = vt.load_deck(vt.Entry.path_all, chapters)
+    deck.journal = vt.Journal(vt.Entry.path_journal)
+    return deck
+
+def contents(deck: vt.Deck) -> list:
+    return [(entry.id, entry.question, entry.answer, deck.state(entry)) for entry in deck]
+
+def make_changes(deck: vt.Deck):
+    entries = list(deck)
+    deck.mark(entries[0], known=True, seen=True)
+    deck.mark(entries[1], seen=True, important=True)
+    deck.mark(entries[1], known=False)
+    deck.delete(entries[2])
+    deck.edit(entries[3], EDITED, "A: Wort drei")
+    deck.mark(entries[3], known=True, seen=True)  # journaled under the new ID of the edit
+
+# Journal
+
+def test_journal_replays_marks_deletes_and_edits(workdir):
+    write_vocab()
+    deck = start_session()
+    make_changes(deck)
+    expected = contents(deck)
+    deck.journal.close()
+
+    deck = vt.load_deck(vt.Entry.path_all)
+    assert contents(deck) == expected
+    assert deck.get(vt.entry_id(EDITED)) is not None
+    assert deck.get(vt.entry_id("Q: word 3 [10 Indexes]")) is None
+
+def test_journal_drops_a_torn_last_record(workdir):
+    write_vocab()
+    deck = start_session()
+    make_changes(deck)
+    expected = contents(deck)
+    deck.journal.close()
+    with open(vt.Entry.path_journal, "ab") as f:
+        f.write(b'{"op": "state", "id": "')  # the trainer crashed in the middle of a record
+
+    deck = start_session()
+    assert contents(deck) == expected
+    with open(vt.Entry.path_journal, "rb") as f:
+        assert f.read().endswith(b"}\n")
+
+    # The records after the cut start on a line of their own
+    deck.mark(list(deck)[4], known=True, seen=True)
+    expected = contents(deck)
+    deck.journal.close()
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+def test_compaction_folds_the_journal_into_the_files(workdir):
+    write_vocab()
+    deck = start_session()
+    make_changes(deck)
+    expected = contents(deck)
+    vt.compact(deck)
+    deck.journal.close()
+
+    assert os.path.getsize(vt.Entry.path_journal) == 0
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+    os.remove(vt.Entry.path_snapshot)
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+def test_long_round_compacts_the_journal(workdir, monkeypatch):
+    write_vocab()
+    deck = start_session()
+    keys = []
+    for card in range(len(ENTRIES)):
+        keys += ["", "d", "y"] if card == 10 else ["", "#"]  # reveal, then known or deleted
+    monkeypatch.setattr(vt, "console", ScriptedConsole(keys))
+    monkeypatch.setattr(vt, "journal_compact_after", 4)
+    vt.run_trainer(deck, "Unseen")
+    expected = contents(deck)
+    deck.journal.close()
+
+    assert len(expected) == len(ENTRIES) - 1
+    assert {state for *_, state in expected} == {"ks"}
+    assert vt.count_lines(vt.Entry.path_journal) < 4
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+def test_partial_deck_is_never_compacted(workdir):
+    write_vocab()
+    deck = start_session(["2"])
+    deck.mark(list(deck)[0], known=True, seen=True)
+    expected = contents(deck)
+    vt.compact(deck)
+    deck.journal.close()
+
+    assert os.path.getsize(vt.Entry.path_journal) > 0
+    assert len(list(vt.iter_vocab_file(vt.Entry.path_all))) == len(ENTRIES)
+    assert contents(vt.load_deck(vt.Entry.path_all, ["2"])) == expected
+
+# Import
+
+def test_import_skips_a_broken_deck(workdir):
+    write_vocab(ENTRIES[:5])
+    with open("broken.txt", "w", encoding="utf-8") as f:
+        f.write("A: an answer without a question\n")
+    vt.import_decks(["broken.txt", vt.Entry.path_all], "merged.txt", workers=1)
+    assert [entry.question for entry in vt.iter_vocab_file("merged.txt")] == [f"Q: {q}" for q, _ in ENTRIES[:5]]
+
+def test_import_never_overwrites_a_broken_output(workdir):
+    write_vocab(ENTRIES[:5])
+    with open("other.txt", "w", encoding="utf-8") as f:
+        f.write("Q: a question\nA: its answer\nQ: a question without an answer\nQ: another one\n")
+    with open("other.txt", "rb") as f:
+        before = f.read()
+    with pytest.raises(ValueError):
+        vt.import_decks([vt.Entry.path_all], "other.txt", workers=1)
+    with open("other.txt", "rb") as f:
+        assert f.read() == before
+
+# Snapshot
+
+def refuse(*args, **kwargs):
+    raise AssertionError("the snapshot should have been used")
+
+def test_snapshot_is_used_while_no_source_changes(workdir, monkeypatch):
+    write_vocab()
+    expected = contents(vt.load_deck(vt.Entry.path_all))
+    assert os.path.exists(vt.Entry.path_snapshot)
+
+    monkeypatch.setattr(vt, "parse_deck", refuse)
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+def test_snapshot_is_rebuilt_after_compaction(workdir):
+    write_vocab()
+    vt.load_deck(vt.Entry.path_all)
+    deck = start_session()
+    make_changes(deck)
+    expected = contents(deck)
+    vt.compact(deck)
+    deck.journal.truncate()  # nothing left to replay, the deck has to come from the rewritten files
+    deck.journal.close()
+
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+def test_snapshot_is_rebuilt_after_a_same_size_change(workdir):
+    write_vocab()
+    vt.load_deck(vt.Entry.path_all)
+    changed = [(question, answer.replace("Wort 7", "Wert 7")) for question, answer in ENTRIES]
+    write_vocab(changed)
+
+    deck = vt.load_deck(vt.Entry.path_all)
+    assert [entry.answer for entry in deck] == [f"A: {answer}" for _, answer in changed]
+
+def test_snapshot_survives_a_touched_source(workdir, monkeypatch):
+    write_vocab()
+    expected = contents(vt.load_deck(vt.Entry.path_all))
+    stat = os.stat(vt.Entry.path_all)
+    os.utime(vt.Entry.path_all, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    monkeypatch.setattr(vt, "parse_deck", refuse)
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+    # The new mtime was stored, the next start does not hash the file again
+    monkeypatch.setattr(vt, "file_digest", refuse)
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+def test_mapped_snapshot_gives_the_same_deck(workdir, monkeypatch):
+    write_vocab()
+    expected = contents(vt.load_deck(vt.Entry.path_all))
+    monkeypatch.setattr(vt, "mmap_min_size", 0)
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+    monkeypatch.setattr(vt, "parse_deck", refuse)
+    assert contents(vt.load_deck(vt.Entry.path_all)) == expected
+
+# Chapters
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("chapters", [["1"], ["2"], ["2.1"], ["10", "1"]])
+def test_chapter_load_matches_the_full_load(workdir, newline, chapters):
+    write_vocab(ENTRIES + CROSS_CHAPTER, newline)
+    deck = start_session()
+    make_changes(deck)
+    deck.journal.close()
+
+    selected = set(vt.select_chapters(CHAPTERS, chapters))
+    full = vt.load_deck(vt.Entry.path_all)
+    expected = [item for item, entry in zip(contents(full), full) if vt.chapter_of(entry.question) in selected]
+    assert expected
+    assert vt.entry_id("Q: Word 5! [1 Basics]") not in {key for key, *_ in expected}
+    assert contents(vt.load_deck(vt.Entry.path_all, chapters)) == expected
+
+def test_chapter_index_follows_the_vocabulary(workdir):
+    write_vocab()
+    assert len(vt.load_deck(vt.Entry.path_all, ["2.1"])) == len(ENTRIES) // len(CHAPTERS)
+    write_vocab(ENTRIES + [("word 40 [2.1 Keys]", "Wort 40")])
+    assert len(vt.load_deck(vt.Entry.path_all, ["2.1"])) == len(ENTRIES) // len(CHAPTERS) + 1